@@ -0,0 +1,218 @@
+import argparse
+import os
+import random
+import scripts.rdlextra as DL
+import scripts.toolbox as toolbox
+
+# Words of each word class. Words in the same tuple are forms of the same word.
+DETS = [("the",), ("a", "an"), ("this", "these"), ("that", "those"), ("my",), ("their",), ("some",), ("every",)]
+PRONS = [("I", "me"), ("he", "him"), ("she", "her"), ("we", "us"), ("they", "them"), ("you",), ("it",)]
+NOUNS = [("cat", "cats"), ("dog", "dogs"), ("house", "houses"), ("teacher", "teachers"), ("problem", "problems"),
+	("idea", "ideas"), ("child", "children"), ("city", "cities"), ("book", "books"), ("student", "students"),
+	("friend", "friends"), ("car", "cars"), ("woman", "women"), ("country", "countries"), ("job", "jobs"),
+	("information",), ("advice",), ("money",), ("music",), ("weather",)]
+VERBS = [("go", "goes", "went", "going", "gone"), ("see", "sees", "saw", "seeing", "seen"),
+	("eat", "eats", "ate", "eating", "eaten"), ("take", "takes", "took", "taking", "taken"),
+	("make", "makes", "made", "making"), ("like", "likes", "liked", "liking"), ("want", "wants", "wanted", "wanting"),
+	("write", "writes", "wrote", "writing", "written"), ("study", "studies", "studied", "studying"),
+	("buy", "buys", "bought", "buying"), ("think", "thinks", "thought", "thinking"), ("give", "gives", "gave", "giving", "given")]
+ADJS = [("big", "bigger", "biggest"), ("small", "smaller", "smallest"), ("old", "older", "oldest"), ("new", "newer", "newest"),
+	("good", "better", "best"), ("happy", "happier", "happiest"), ("important",), ("different",), ("beautiful",)]
+# Adverbs that can come before a verb.
+ADVS = [("often",), ("always",), ("never",), ("also",), ("really",)]
+PREPS = [("in",), ("on",), ("at",), ("for",), ("with",), ("to",), ("from",), ("about",), ("of",)]
+CONJS = [("and",), ("but",), ("because",), ("so",), ("when",)]
+# Words that are wrongly used instead of each other, e.g. the determiners or prepositions.
+CLASSES = [DETS, PREPS, CONJS]
+# Each word and the words it can be confused with; other forms of it, or words of the same closed class.
+CONFUSIONS = {}
+for word_class in [DETS, PRONS, NOUNS, VERBS, ADJS, ADVS, PREPS, CONJS]:
+	for forms in word_class:
+		for word in forms:
+			others = [form for form in forms if form != word]
+			if word_class in CLASSES:
+				others += [other[0] for other in word_class if other is not forms]
+			if others: CONFUSIONS[word] = others
+# Short function words that writers add or leave out.
+FUNCTION_WORDS = ["the", "a", "to", "of", "in", "for", "is", "that", "it", "and"]
+# The error categories of edits in generated m2 files, by edit operation.
+CATEGORIES = {"S": ["R:NOUN:NUM", "R:VERB:SVA", "R:VERB:FORM", "R:VERB:TENSE", "R:DET", "R:PREP", "R:SPELL", "R:ORTH", "R:OTHER"],
+	"I": ["M:DET", "M:PREP", "M:VERB", "M:PUNCT", "M:OTHER"],
+	"D": ["U:DET", "U:PREP", "U:VERB", "U:PUNCT", "U:OTHER"],
+	"T": ["R:WO"]}
+
+# Input 1: A random.Random.
+# Input 2: A list of tuples of word forms.
+# Output: The first form of a random word.
+def pick(rand, word_class):
+	return rand.choice(word_class)[0]
+
+# Input: A random.Random.
+# Output 1: A list of tokens of a noun phrase.
+# Output 2: Boolean; the noun phrase is plural.
+def nounPhrase(rand):
+	noun = rand.choice(NOUNS)
+	plural = len(noun) > 1 and rand.random() < 0.4
+	if plural: det = rand.choice(["the", "these", "those", "my", "their", "some"])
+	elif len(noun) > 1: det = rand.choice(["the", "a", "this", "that", "my", "their", "every"])
+	else: det = rand.choice(["the", "my", "their", "some"])
+	phrase = [det]
+	if rand.random() < 0.4: phrase.append(pick(rand, ADJS))
+	phrase.append(noun[plural])
+	# "a" comes before a consonant.
+	if det == "a" and phrase[1][0] in "aeiou": phrase[0] = "an"
+	return phrase, plural
+
+# Input: A random.Random.
+# Output: A list of tokens of a clause; a subject, verb, object and any prepositional phrases.
+def clause(rand):
+	if rand.random() < 0.4:
+		pronoun = pick(rand, PRONS)
+		tokens, singular = [pronoun], pronoun in ["he", "she", "it"]
+	else:
+		tokens, plural = nounPhrase(rand)
+		singular = not plural
+	if rand.random() < 0.3: tokens.append(pick(rand, ADVS))
+	# Past, or present that agrees with the subject.
+	verb = rand.choice(VERBS)
+	tokens.append(verb[2] if rand.random() < 0.4 else verb[1] if singular else verb[0])
+	tokens += nounPhrase(rand)[0]
+	while rand.random() < 0.5:
+		tokens += [pick(rand, PREPS)]+nounPhrase(rand)[0]
+	return tokens
+
+# Input 1: A random.Random.
+# Input 2: The number of tokens in the sentence.
+# Output: A list of tokens of a correct looking sentence that ends with a full stop.
+def sentence(rand, length):
+	tokens = clause(rand)
+	while len(tokens) < length-1:
+		tokens += [",", pick(rand, CONJS)]+clause(rand) if rand.random() < 0.5 else [pick(rand, CONJS)]+clause(rand)
+	tokens = tokens[:max(length-1, 1)]
+	tokens[0] = tokens[0][0].upper()+tokens[0][1:]
+	return tokens+["."]
+
+# Input 1: A random.Random.
+# Input 2: A list of tokens.
+# Input 3: The chance that each token is replaced.
+# Output: A copy of the tokens where some words are replaced by other forms or words of the same class.
+def varyWords(rand, tokens, rate):
+	return [rand.choice(CONFUSIONS[token]) if token in CONFUSIONS and rand.random() < rate else token for token in tokens]
+
+# Input 1: A random.Random.
+# Input 2: A list of tokens.
+# Input 3: The chance that each token has an error.
+# Input 4: The fraction of errors that are transpositions.
+# Output: A copy of the tokens with errors.
+def addErrors(rand, tokens, edit_rate, transpositions):
+	tokens = list(tokens)
+	errors = sum([rand.random() < edit_rate for token in tokens])
+	for error in range(errors):
+		i = rand.randrange(len(tokens))
+		if rand.random() < transpositions:
+			# Swap two adjacent tokens, or move a token over two others.
+			k = rand.choice([2, 2, 3])
+			if i+k <= len(tokens):
+				tokens[i:i+k] = tokens[i+1:i+k]+[tokens[i]]
+			continue
+		kind = rand.random()
+		word = tokens[i]
+		# Wrong form or word.
+		if kind < 0.45 and word in CONFUSIONS:
+			tokens[i] = rand.choice(CONFUSIONS[word])
+		# Missing word.
+		elif kind < 0.6 and len(tokens) > 1:
+			del tokens[i]
+		# Unnecessary word.
+		elif kind < 0.75:
+			tokens.insert(i, rand.choice(FUNCTION_WORDS))
+		# Wrong case.
+		elif kind < 0.85:
+			tokens[i] = word.lower() if word[0].isupper() else word.capitalize()
+		# Spelling; swap or drop a letter.
+		elif len(word) > 3:
+			j = rand.randrange(1, len(word)-1)
+			tokens[i] = word[:j]+word[j+1]+word[j]+word[j+2:] if rand.random() < 0.5 else word[:j]+word[j+1:]
+	return tokens
+
+# Input 1: The number of sentences.
+# Input 2: The number of tokens in each correct sentence.
+# Input 3: The chance that each token of a sentence has an error. (default: 0.15)
+# Input 4: The fraction of errors that are transpositions. (default: 0.1)
+# Input 5: The number of annotators. (default: 1)
+# Input 6: The chance that an annotator makes the same correction as the first one. (default: 0.5)
+# Input 7: A random seed. (default: 0)
+# Output: A list of (orig tokens, list of cor tokens) tuples; one cor for each annotator.
+# The same arguments always give the same corpus.
+def makeCorpus(sents, length, edit_rate=0.15, transpositions=0.1, coders=1, agreement=0.5, seed=0):
+	rand = random.Random(seed)
+	corpus = []
+	for sent_id in range(sents):
+		cor = sentence(rand, length)
+		orig = addErrors(rand, cor, edit_rate, transpositions)
+		cors = [cor]
+		# Other annotators agree with the first, or correct some words differently.
+		for coder in range(1, coders):
+			cors.append(cor if rand.random() < agreement else varyWords(rand, cor, edit_rate))
+		corpus.append((orig, cors))
+	return corpus
+
+# Input 1: A makeCorpus list.
+# Input 2: A random seed for the error categories. (default: 0)
+# Input 3: The annotators to include; a list of indexes of the cors. (default: all)
+# Output: The corpus in m2 format.
+# Edits come from a plain Damerau-Levenshtein alignment, with a random category of the right operation.
+def toM2(corpus, seed=0, coders=None):
+	rand = random.Random(seed)
+	out_m2 = []
+	for orig, cors in corpus:
+		out_m2.append("S "+" ".join(orig)+"\n")
+		for coder_id, coder in enumerate(coders if coders is not None else range(len(cors))):
+			cor = cors[coder]
+			if cor == orig:
+				out_m2.append("A -1 -1|||noop|||-NONE-|||REQUIRED|||-NONE-|||"+str(coder_id)+"\n")
+				continue
+			alignment = DL.WagnerFischer(orig, cor).best_alignment()
+			o_start, c_start = 0, 0
+			for op in alignment:
+				# The number of orig and cor tokens of the operation.
+				o_len, c_len = {"D": (1, 0), "I": (0, 1)}.get(op[0], (1, 1))
+				if op[0] == "T": o_len = c_len = int(op[1:] or 2)
+				if op[0] != "M":
+					edit = [o_start, o_start+o_len, rand.choice(CATEGORIES[op[0]]), " ".join(cor[c_start:c_start+c_len])]
+					out_m2.append(toolbox.formatEdit(edit, coder_id)+"\n")
+				o_start += o_len
+				c_start += c_len
+		out_m2.append("\n")
+	return "".join(out_m2)
+
+def main(args):
+	corpus = makeCorpus(args.sents, args.length, args.edit_rate, args.transpositions, args.coders, args.agreement, args.seed)
+	if not os.path.isdir(args.out): os.makedirs(args.out)
+	with open(os.path.join(args.out, "orig.txt"), "w") as out:
+		out.write("".join([" ".join(orig)+"\n" for orig, cors in corpus]))
+	for coder in range(args.coders):
+		with open(os.path.join(args.out, "cor{}.txt".format(coder+1)), "w") as out:
+			out.write("".join([" ".join(cors[coder])+"\n" for orig, cors in corpus]))
+	with open(os.path.join(args.out, "ref.m2"), "w") as out:
+		out.write(toM2(corpus, args.seed))
+	print("Saved {} sentences of {} tokens to {}".format(args.sents, args.length, args.out))
+
+if __name__ == "__main__":
+	# Define and parse program input
+	parser = argparse.ArgumentParser(description="Generate a synthetic parallel corpus for benchmarks.\n"
+								"Writes DIR/orig.txt, one DIR/corN.txt for each annotator and DIR/ref.m2.",
+								formatter_class=argparse.RawTextHelpFormatter,
+								usage="%(prog)s [-h] [options] -out DIR")
+	parser.add_argument("-out", help="The output directory.", required=True)
+	parser.add_argument("-sents", help="The number of sentences. (default: 1000)", default=1000, type=int)
+	parser.add_argument("-length", help="The number of tokens in each corrected sentence. (default: 20)", default=20, type=int)
+	parser.add_argument("-edit_rate", help="The chance that each token has an error. (default: 0.15)", default=0.15, type=float)
+	parser.add_argument("-transpositions", help="The fraction of errors that are transpositions. (default: 0.1)", default=0.1, type=float)
+	parser.add_argument("-coders", help="The number of annotators. (default: 1)", default=1, type=int)
+	parser.add_argument("-agreement", help="The chance that an annotator makes the same correction as the first.\n"
+								"(default: 0.5)", default=0.5, type=float)
+	parser.add_argument("-seed", help="The random seed. (default: 0)", default=0, type=int)
+	args = parser.parse_args()
+	# Run the program.
+	main(args)
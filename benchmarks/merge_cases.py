@@ -0,0 +1,177 @@
+import argparse
+import json
+import os
+import random
+import spacy.parts_of_speech as POS
+import scripts.align_text as align_text
+
+# The default regression corpus of the merging rules.
+CASES_PATH = os.path.join(os.path.dirname(os.path.realpath(__file__)), "merge_cases.jsonl")
+# Each word and its PTB tag and universal part of speech; only what the merging rules read.
+VOCAB = {"the": ("DT", "DET"), "a": ("DT", "DET"), "an": ("DT", "DET"), "this": ("DT", "DET"), "some": ("DT", "DET"),
+	"cat": ("NN", "NOUN"), "cats": ("NNS", "NOUN"), "book": ("NN", "NOUN"), "books": ("NNS", "NOUN"),
+	"way": ("NN", "NOUN"), "day": ("NN", "NOUN"), "one": ("NN", "NOUN"), "subway": ("NN", "NOUN"),
+	"everyday": ("JJ", "ADJ"), "anyone": ("NN", "NOUN"), "sub": ("NN", "NOUN"), "every": ("DT", "DET"), "any": ("DT", "DET"),
+	"go": ("VB", "VERB"), "goes": ("VBZ", "VERB"), "went": ("VBD", "VERB"), "going": ("VBG", "VERB"),
+	"eat": ("VB", "VERB"), "eaten": ("VBN", "VERB"), "has": ("VBZ", "VERB"), "have": ("VBP", "VERB"), "was": ("VBD", "VERB"),
+	"to": ("TO", "PART"), "n't": ("RB", "PART"), "'s": ("POS", "PART"), "not": ("RB", "PART"), "can": ("MD", "VERB"),
+	"cannot": ("MD", "VERB"), "in": ("IN", "ADP"), "of": ("IN", "ADP"), "for": ("IN", "ADP"), "because": ("IN", "ADP"),
+	"big": ("JJ", "ADJ"), "bigger": ("JJR", "ADJ"), "quickly": ("RB", "ADV"), "very": ("RB", "ADV"),
+	"he": ("PRP", "PRON"), "him": ("PRP", "PRON"), "it": ("PRP", "PRON"), "we": ("PRP", "PRON"),
+	",": (",", "PUNCT"), ".": (".", "PUNCT"), "!": (".", "PUNCT"), "and": ("CC", "CCONJ")}
+WORDS = sorted(VOCAB)
+# Words that are also written as two words, e.g. subway -> sub way.
+COMPOUNDS = {"subway": ["sub", "way"], "everyday": ["every", "day"], "cannot": ["can", "not"], "anyone": ["any", "one"]}
+
+# A token with the attributes of a spacy token that the merging rules read.
+class Token(object):
+
+	def __init__(self, orth):
+		tag, pos = VOCAB[orth.lower()]
+		self.orth_ = orth
+		self.lower_ = orth.lower()
+		self.tag_ = tag
+		self.pos = getattr(POS, pos)
+
+# A list of Tokens that can be sliced like a spacy sentence; a slice has the orth_ of its tokens.
+class Sentence(list):
+
+	def __getitem__(self, i):
+		if isinstance(i, slice): return Sentence(list.__getitem__(self, i))
+		return list.__getitem__(self, i)
+
+	@property
+	def orth_(self):
+		return " ".join([tok.orth_ for tok in self])
+
+# Input 1: A random.Random.
+# Input 2: The number of operations in the alignment.
+# Input 3: The chance that an operation is a match.
+# Output 1: A list of source token strings.
+# Output 2: A list of target token strings.
+# Output 3: An alignment of them; e.g. ["M", "S", "D", "T2"].
+# Besides random operations, the alignment has the patterns that some rules look for:
+# case changes after punctuation, possessives, determiners and split compounds.
+def makeCase(rand, ops, match_rate):
+	source, target, alignment = [], [], []
+	while len(alignment) < ops:
+		word = rand.choice(WORDS)
+		kind = rand.random()
+		if kind < match_rate:
+			source.append(word)
+			target.append(word)
+			alignment.append("M")
+		elif kind < match_rate+0.05 and len(alignment)+2 <= ops:
+			# A compound and its parts; one substitution and one insertion or deletion.
+			compound = rand.choice(sorted(COMPOUNDS))
+			parts = COMPOUNDS[compound]
+			if rand.random() < 0.5:
+				source.append(compound)
+				target.extend(parts)
+				alignment.extend(["S", "I"])
+			else:
+				source.extend(parts)
+				target.append(compound)
+				alignment.extend(["S", "D"])
+		elif kind < match_rate+0.1 and len(alignment)+2 <= ops:
+			# A punctuation change followed by a change in case; e.g. ", we" -> ". We"
+			source.extend([rand.choice([",", "."]), word])
+			target.extend([rand.choice([".", "!"]), word.capitalize()])
+			alignment.extend(["S", "S"])
+		elif kind < match_rate+0.15 and len(alignment)+3 <= ops:
+			# A transposition of 2 or 3 tokens.
+			k = rand.choice([2, 3])
+			words = [rand.choice(WORDS) for i in range(k)]
+			source.extend(words)
+			target.extend(words[1:]+words[:1])
+			alignment.append("T"+str(k))
+		else:
+			op = rand.choice(["S", "S", "D", "I"])
+			# Some edits involve a possessive or a determiner.
+			if rand.random() < 0.15: word = rand.choice(["'s", "the", "a"])
+			if op == "S":
+				other = rand.choice(WORDS)
+				if other == word: other = word.capitalize()
+				source.append(word)
+				target.append(other)
+			elif op == "D": source.append(word)
+			else: target.append(word)
+			alignment.append(op)
+	return source, target, alignment
+
+# Input 1: The number of cases.
+# Input 2: The number of operations in each alignment.
+# Input 3: The chance that an operation is a match.
+# Input 4: A random seed.
+# Output: A list of (source Sentence, target Sentence, opcodes) tuples; see align_text.get_opcodes.
+def makeCases(count, ops, match_rate, seed=0):
+	rand = random.Random(seed)
+	cases = []
+	for case in range(count):
+		source, target, alignment = makeCase(rand, ops, match_rate)
+		cases.append((toSentence(source), toSentence(target), align_text.get_opcodes(alignment)))
+	return cases
+
+# Input: A list of token strings.
+# Output: A Sentence of them.
+def toSentence(words):
+	return Sentence([Token(word) for word in words])
+
+# Input 1: The path of the corpus.
+# Input 2: The number of cases.
+# Input 3: A random seed.
+# Input 4: The function that merges the edits of a case; e.g. align_text.get_edits.
+# Save randomised alignments of 1 to 60 operations and their merged edits, one JSON object per line.
+def writeCases(path, count, seed, get_edits):
+	rand = random.Random(seed)
+	with open(path, "w") as out:
+		for case in range(count):
+			source, target, alignment = makeCase(rand, rand.randint(1, 60), rand.choice([0.1, 0.3, 0.5]))
+			opcodes = align_text.get_opcodes(alignment)
+			edits = get_edits(toSentence(source), toSentence(target), opcodes)
+			out.write(json.dumps({"source": source, "target": target, "alignment": alignment,
+				"edits": [list(edit) for edit in edits]}, separators=(",", ":"))+"\n")
+
+# Input: The path of the corpus.
+# Output: The number of cases, and a list of the cases whose edits differ from align_text.get_edits.
+def checkCases(path):
+	count = 0
+	failed = []
+	with open(path) as cases:
+		for line in cases:
+			case = json.loads(line)
+			count += 1
+			opcodes = align_text.get_opcodes(case["alignment"])
+			edits = align_text.get_edits(toSentence(case["source"]), toSentence(case["target"]), opcodes)
+			if [list(edit) for edit in edits] != case["edits"]:
+				failed.append(case)
+	return count, failed
+
+def main(args):
+	if args.write:
+		writeCases(args.cases, args.count, args.seed, align_text.get_edits)
+		print("Saved {} cases to {}".format(args.count, args.cases))
+		return
+	count, failed = checkCases(args.cases)
+	for case in failed[:10]:
+		print("Different edits: "+" ".join(case["alignment"]))
+		print("  source: "+" ".join(case["source"]))
+		print("  target: "+" ".join(case["target"]))
+	print("{} of {} cases have the expected edits.".format(count-len(failed), count))
+	if failed: exit(1)
+
+if __name__ == "__main__":
+	# Define and parse program input
+	parser = argparse.ArgumentParser(description="Check that align_text.get_edits merges the edits of a corpus of randomised\n"
+								"alignments as expected. Run from the ERRANT directory with: python3 -m benchmarks.merge_cases",
+								formatter_class=argparse.RawTextHelpFormatter,
+								usage="%(prog)s [-h] [options]")
+	parser.add_argument("-cases", help="The corpus of alignments and merged edits. (default: benchmarks/merge_cases.jsonl)",
+								default=CASES_PATH)
+	parser.add_argument("-write", help="Save a new corpus with the edits of the current get_edits instead, e.g.\n"
+								"after the merging rules have changed on purpose.", action="store_true")
+	parser.add_argument("-count", help="The number of cases to write. (default: 1000)", default=1000, type=int)
+	parser.add_argument("-seed", help="The random seed of the cases to write. (default: 0)", default=0, type=int)
+	args = parser.parse_args()
+	# Run the program.
+	main(args)
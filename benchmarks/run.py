@@ -0,0 +1,283 @@
+import argparse
+import json
+import math
+import os
+import platform
+import shutil
+import tempfile
+import time
+from argparse import Namespace
+import compare_m2
+import scripts.rdlextra as DL
+import scripts.ref_index as ref_index
+import scripts.toolbox as toolbox
+from benchmarks.corpus import makeCorpus, toM2
+
+# The stages that can be timed, in the order they are run.
+STAGES = ["wagner_fischer", "merge", "get_edits", "auto_type", "parallel_to_m2", "compare_m2", "ref_index"]
+# The stages that need spacy and the other resources.
+SPACY_STAGES = ["get_edits", "auto_type", "parallel_to_m2"]
+# The number of alignments of each length that the merge stage merges, and the chance that an
+# operation in them is a match. Most operations are edits, so the groups of edits are long.
+MERGE_SEQUENCES = 10
+MERGE_MATCH_RATE = 0.1
+
+def main(args):
+	# Get base working directory.
+	basename = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+	stages = [stage for stage in STAGES if stage in args.stages]
+	loaded = None
+	if set(stages) & set(SPACY_STAGES):
+		print("Loading resources...")
+		loaded = loadResources(basename)
+	results = {}
+	for stage in stages:
+		results[stage] = {"lengths": {}}
+		for length in args.merge_lengths if stage == "merge" else args.lengths:
+			# The merge stage merges the edits of long alignments rather than sentences.
+			if stage == "merge":
+				corpus = mergeCases(length, args)
+			# The ref has one extra annotator, which is used as the hyp of compare_m2.
+			else:
+				corpus = makeCorpus(args.sents, length, args.edit_rate, args.transpositions, args.coders+1, args.agreement, args.seed)
+			results[stage]["lengths"][str(length)] = timeStage(stage, corpus, loaded, args)
+			print(formatResult(stage, length, results[stage]["lengths"][str(length)]))
+		results[stage]["exponent"] = scalingExponent(results[stage]["lengths"])
+		if results[stage]["exponent"] is not None:
+			print("{} time per sentence grows as length^{:.2f}".format(stage, results[stage]["exponent"]))
+	report = {"config": {key: value for key, value in vars(args).items() if key not in ["out", "baseline"]},
+		"python": platform.python_version(),
+		"results": results}
+	if args.out:
+		with open(args.out, "w") as out:
+			json.dump(report, out, indent=1)
+		print("Saved results to "+args.out)
+	if args.baseline:
+		with open(args.baseline) as baseline:
+			compareBaseline(json.load(baseline), report, args.threshold)
+
+# Input: The base working directory of ERRANT.
+# Output: The resources of parallel_to_m2.py; see resources.loadResources.
+def loadResources(basename):
+	# Only import spacy when a stage needs it.
+	try:
+		import scripts.resources as resources
+	except ImportError:
+		print("Error: the "+", ".join(SPACY_STAGES)+" stages require spacy; see the readme.")
+		exit()
+	return resources.loadResources(basename)
+
+# Input 1: The name of a stage.
+# Input 2: A makeCorpus list.
+# Input 3: The resources of parallel_to_m2.py, or None.
+# Input 4: Command line args.
+# Output: A dictionary of the fastest time of the stage over the repeats, and its throughput.
+# Every cache is cleared before each repeat, so each one starts cold.
+def timeStage(stage, corpus, loaded, args):
+	work_dir = tempfile.mkdtemp()
+	try:
+		run = {"wagner_fischer": wagnerFischerStage,
+			"merge": mergeStage,
+			"get_edits": getEditsStage,
+			"auto_type": autoTypeStage,
+			"parallel_to_m2": parallelStage,
+			"compare_m2": compareStage,
+			"ref_index": refIndexStage}[stage](corpus, loaded, work_dir, args)
+		times = []
+		for repeat in range(args.repeat):
+			toolbox.clearCaches()
+			start = time.perf_counter()
+			run()
+			times.append(time.perf_counter()-start)
+	finally:
+		shutil.rmtree(work_dir)
+	seconds = min(times)
+	tokens = sum([len(sent[0]) for sent in corpus])
+	return {"seconds": seconds, "sents_per_sec": len(corpus)/seconds, "tokens_per_sec": tokens/seconds}
+
+# Input 1: A makeCorpus list.
+# Output: A list of (orig, cor) pairs of tokens of the annotators of the corpus, without the hyp.
+def sentencePairs(corpus):
+	return [(orig, cor) for orig, cors in corpus for cor in cors[:-1] if cor != orig]
+
+# Each stage function takes a makeCorpus list, the resources of parallel_to_m2.py, a temporary
+# directory and the command line args, and returns a function that runs the stage once.
+# Anything the stage needs as input, e.g. spacy markup, is prepared before it is timed.
+
+# Align the token strings with the default costs of rdlextra.
+def wagnerFischerStage(corpus, loaded, work_dir, args):
+	pairs = sentencePairs(corpus)
+	def run():
+		for orig, cor in pairs:
+			DL.WagnerFischer(orig, cor).best_alignment()
+	return run
+
+# Input 1: The number of operations in each alignment.
+# Input 2: Command line args.
+# Output: A list of (source, target, opcodes) tuples; see merge_cases.makeCases.
+def mergeCases(length, args):
+	# Only import spacy when the stage is run.
+	try:
+		import benchmarks.merge_cases as merge_cases
+	except ImportError:
+		print("Error: the merge stage requires spacy; see the readme.")
+		exit()
+	return merge_cases.makeCases(MERGE_SEQUENCES, length, MERGE_MATCH_RATE, args.seed)
+
+# Merge the edits of alignments with the rules of align_text.get_edits, without aligning them first.
+def mergeStage(corpus, loaded, work_dir, args):
+	import scripts.align_text as align_text
+	def run():
+		for source, target, opcodes in corpus:
+			align_text.get_edits(source, target, opcodes)
+	return run
+
+# Input: The resources of parallel_to_m2.py and a list of (orig, cor) pairs of tokens.
+# Output: A list of (proc_orig, proc_cor) pairs of spacy marked up sentences.
+def markupPairs(loaded, pairs):
+	nlp = loaded[0]
+	sents = [sent for pair in pairs for sent in pair]
+	proc_sents = toolbox.applySpacyBatch(sents, nlp, 100)
+	return list(zip(proc_sents[0::2], proc_sents[1::2]))
+
+# Align and merge the edits of spacy marked up sentences; align_text.getAutoAlignedEdits.
+def getEditsStage(corpus, loaded, work_dir, args):
+	import scripts.align_text as align_text
+	proc_pairs = markupPairs(loaded, sentencePairs(corpus))
+	options = Namespace(lev=False, merge="rules", band=None, max_transposition=None)
+	def run():
+		for proc_orig, proc_cor in proc_pairs:
+			align_text.getAutoAlignedEdits(proc_orig, proc_cor, loaded[0], options)
+	return run
+
+# Classify the edits of spacy marked up sentences; cat_rules.autoTypeEdit.
+def autoTypeStage(corpus, loaded, work_dir, args):
+	import scripts.align_text as align_text
+	import scripts.cat_rules as cat_rules
+	nlp, stemmer, gb_spell, tag_map = loaded
+	proc_pairs = markupPairs(loaded, sentencePairs(corpus))
+	options = Namespace(lev=False, merge="rules", band=None, max_transposition=None)
+	edits = [(edit, proc_orig, proc_cor) for proc_orig, proc_cor in proc_pairs
+		for edit in align_text.getAutoAlignedEdits(proc_orig, proc_cor, nlp, options)]
+	def run():
+		for edit, proc_orig, proc_cor in edits:
+			cat_rules.autoTypeEdit(edit, proc_orig, proc_cor, gb_spell, tag_map, nlp, stemmer)
+	return run
+
+# Markup, align and classify the sentences as parallel_to_m2.py does with its default options.
+def parallelStage(corpus, loaded, work_dir, args):
+	import parallel_to_m2
+	lines = [[" ".join(orig)]+[" ".join(cor) for cor in cors[:-1]] for orig, cors in corpus]
+	options = Namespace(lev=False, merge="rules", band=None, max_transposition=None, batch_size=100,
+		cache_dir=None, cache_size=0, result_cache=100000, lazy_parse=False)
+	def run():
+		for i in range(0, len(lines), options.batch_size):
+			parallel_to_m2.processChunk(lines[i:i+options.batch_size], options, *loaded)
+	return run
+
+# Score the last annotator of the corpus against the others as compare_m2.py does with its default options,
+# or with -all.
+def compareStage(corpus, loaded, work_dir, args):
+	return compareRun(corpus, work_dir, args, False)
+
+# The same as the compare_m2 stage, but the ref is read from an index made with index_m2.py first.
+def refIndexStage(corpus, loaded, work_dir, args):
+	return compareRun(corpus, work_dir, args, True)
+
+# Input 1: A makeCorpus list.
+# Input 2: A temporary directory.
+# Input 3: Command line args.
+# Input 4: Read the ref from an index.
+# Output: A function that scores the corpus once; see compareStage.
+def compareRun(corpus, work_dir, args, index):
+	hyp_path = os.path.join(work_dir, "hyp.m2")
+	ref_path = os.path.join(work_dir, "ref.m2")
+	with open(hyp_path, "w") as out:
+		out.write(toM2(corpus, args.seed, [len(corpus[0][1])-1]))
+	with open(ref_path, "w") as out:
+		out.write(toM2(corpus, args.seed, range(len(corpus[0][1])-1)))
+	index_path = None
+	if index:
+		index_path = ref_path+".idx"
+		ref_index.writeIndex(index_path, ref_path, (compare_m2.parseEdits(sent) for sent in compare_m2.loadM2(ref_path)))
+	options = Namespace(verbose=False, beta=0.5, multi=False, cat=None, det_tok=False, det_span=False, cor_span_err=False,
+		workers=1, bootstrap=None, hyp2=None, ci=95, seed=0, all=args.all, ref_index=index_path, format="table")
+	def run():
+		scorers = [compare_m2.Scorer(mode) for mode in compare_m2.evalModes(options)]
+		for sent_id, sent_scores in enumerate(compare_m2.scoreFiles([hyp_path], ref_path, options)):
+			for scorer, mode_scores in zip(scorers, sent_scores):
+				scorer.add(sent_id, mode_scores[0])
+	return run
+
+# Input: A dictionary; key is sentence length, value is a timeStage result.
+# Output: The slope of log time per sentence against log length, or None with fewer than two lengths.
+# E.g. 2 means that doubling the sentence length makes each sentence four times slower.
+def scalingExponent(lengths):
+	points = [(math.log(int(length)), math.log(1/result["sents_per_sec"])) for length, result in lengths.items()]
+	if len(points) < 2: return None
+	mean_x = sum([x for x, y in points])/len(points)
+	mean_y = sum([y for x, y in points])/len(points)
+	var_x = sum([(x-mean_x)**2 for x, y in points])
+	if not var_x: return None
+	return sum([(x-mean_x)*(y-mean_y) for x, y in points])/var_x
+
+# Input 1: The name of a stage.
+# Input 2: The length of the sentences.
+# Input 3: A timeStage result.
+# Output: A line of the results.
+def formatResult(stage, length, result):
+	return "{:<16}length {:>4}: {:>10.1f} sents/s {:>12.1f} tokens/s {:>9.3f}s".format(
+		stage, length, result["sents_per_sec"], result["tokens_per_sec"], result["seconds"])
+
+# Input 1: The report of an earlier run.
+# Input 2: The report of this run.
+# Input 3: The percentage by which a stage may be slower than the baseline before it is flagged.
+# Print the change in speed of each stage and length that is in both reports.
+def compareBaseline(baseline, report, threshold):
+	print("")
+	print('{:=^66}'.format(" Compared to Baseline "))
+	for stage, stage_results in report["results"].items():
+		for length, result in stage_results["lengths"].items():
+			base = baseline["results"].get(stage, {}).get("lengths", {}).get(length)
+			if not base: continue
+			change = 100*(result["sents_per_sec"]/base["sents_per_sec"]-1)
+			flag = "  SLOWER" if change < -threshold else ""
+			print("{:<16}length {:>4}: {:>+7.1f}%{}".format(stage, length, change, flag))
+	print('{:=^66}'.format(""))
+
+if __name__ == "__main__":
+	# Define and parse program input
+	parser = argparse.ArgumentParser(description="Time the stages of ERRANT on synthetic corpora of different sentence lengths.\n"
+								"Run from the ERRANT directory with: python3 -m benchmarks.run",
+								formatter_class=argparse.RawTextHelpFormatter,
+								usage="%(prog)s [-h] [options]")
+	parser.add_argument("-stages", help="The stages to time. (default: all)\n"
+								"wagner_fischer: Align token strings with rdlextra.WagnerFischer.\n"
+								"merge: Merge the edits of long alignments with align_text.get_edits only.\n"
+								"get_edits: Align and merge marked up sentences with align_text.getAutoAlignedEdits.\n"
+								"auto_type: Classify the edits with cat_rules.autoTypeEdit.\n"
+								"parallel_to_m2: Markup, align and classify sentences as parallel_to_m2.py.\n"
+								"compare_m2: Score one annotator against the others as compare_m2.py.\n"
+								"ref_index: The same as compare_m2, with the ref read from an index_m2.py index.",
+								nargs="+", choices=STAGES, default=STAGES)
+	parser.add_argument("-lengths", help="The sentence lengths in tokens. (default: 5 10 20 40 80)",
+								nargs="+", default=[5, 10, 20, 40, 80], type=int)
+	parser.add_argument("-merge_lengths", help="The number of operations in the alignments of the merge stage.\n"
+								"(default: 100 500 2000)", nargs="+", default=[100, 500, 2000], type=int)
+	parser.add_argument("-sents", help="The number of sentences of each length. (default: 200)", default=200, type=int)
+	parser.add_argument("-edit_rate", help="The chance that each token has an error. (default: 0.15)", default=0.15, type=float)
+	parser.add_argument("-transpositions", help="The fraction of errors that are transpositions. (default: 0.1)", default=0.1, type=float)
+	parser.add_argument("-coders", help="The number of annotators. (default: 2)", default=2, type=int)
+	parser.add_argument("-agreement", help="The chance that an annotator makes the same correction as the first.\n"
+								"(default: 0.5)", default=0.5, type=float)
+	parser.add_argument("-seed", help="The random seed of the corpus. (default: 0)", default=0, type=int)
+	parser.add_argument("-all", help="Score the compare_m2 and ref_index stages in every evaluation mode, as\n"
+								"compare_m2.py -all.", action="store_true")
+	parser.add_argument("-repeat", help="Time each stage this many times and keep the fastest. (default: 3)", default=3, type=int)
+	parser.add_argument("-out", help="Save the results to this JSON file.")
+	parser.add_argument("-baseline", help="A JSON file of earlier results to compare with.")
+	parser.add_argument("-threshold", help="Flag stages that are more than this many percent slower than the baseline.\n"
+								"(default: 10)", default=10, type=float)
+	args = parser.parse_args()
+	# Run the program.
+	main(args)
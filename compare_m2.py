@@ -1,40 +1,77 @@
 import argparse
+import csv
+import glob
+import json
+import sys
+from argparse import Namespace
+from itertools import chain, zip_longest
 from os.path import isfile
+import scripts.edit_sets as edit_sets
+import scripts.ref_index as ref_index
+import scripts.toolbox as toolbox
+import scripts.workers as workers
+
+# The number of sentences sent to a worker at a time.
+CHUNK_SIZE = 500
+# The evaluation modes of -all; the values of det_tok, det_span and cor_span_err.
+MODES = [(False, False, False), (False, False, True), (False, True, False), (True, False, False)]
 
 # Input: A path to an m2 file.
-# Output: A list of sentence+edits in that file.
+# Output: A generator of the sentence+edits blocks in that file.
 def loadM2(path):
 	if isfile(path):
-		return open(path).read().strip().split("\n\n")
+		return toolbox.readM2(path)
 	else:
 		print("Error: "+path+" is not a file.")
 		exit()
 
-# Input 1: An m2 format sentence with edits.
+# Input 1: A path to the ref m2 file.
+# Input 2: Command line options.
+# Output: A generator of the sentences of the ref; m2 blocks, or IndexSentences with -ref_index.
+def loadRef(path, args):
+	if args.ref_index:
+		index = ref_index.loadIndex(args.ref_index, path)
+		if index:
+			return index.sentences()
+		print("Warning: "+args.ref_index+" is not an index of "+path+"; reading "+path+" instead.")
+	return loadM2(path)
+
+# Input 1: An m2 format sentence with edits; a string or a toolbox.M2Block.
 # Input 2: Command line options.
 # Output: A dictionary where key is coder and value is edit dict.
 # Each subdict might be for detection, correction, or token based detection.
 def extractEdits(sent, args):
-	coder_dict = {}
-	edits = sent.split("\n")[1:]
+	return buildEdits(parseEdits(sent), args)
+
+# Input: An m2 format sentence with edits; a string or a toolbox.M2Block.
+# Output: A list of (start, end, cat, cor, cor_len, coder) tuples; one for each edit.
+# cat and cor are the ids of the category and correction strings; see edit_sets.Interner.
+def parseEdits(sent):
+	parsed = []
+	lines = sent.split("\n") if isinstance(sent, str) else sent.lines
+	edits = lines[1:]
 	# If there are no edits, pretend there was an explicit noop
 	if not edits: edits = ["A -1 -1|||noop|||-NONE-|||REQUIRED|||-NONE-|||0"]
 	for edit in edits:
 		# Preprocessing
 		edit = edit[2:].split("|||") # Ignore "A " then split.
-		span = [int(i) for i in edit[0].split()]
-		start = span[0]
-		end = span[1]
-		cat = edit[1]
-		cor = edit[2]
-		cor_len = len(cor.split())
-		coder = int(edit[-1])
+		start, end = map(int, edit[0].split())
+		parsed.append((start, end, edit_sets.CATS[edit[1]], edit_sets.CORS[edit[2]], len(edit[2].split()), int(edit[-1])))
+	return parsed
+
+# Input 1: A list of parseEdits tuples.
+# Input 2: Command line options.
+# Output: A dictionary where key is coder and value is edit dict; see extractEdits.
+# The same parsed edits can be used for each evaluation mode.
+def buildEdits(edits, args):
+	coder_dict = {}
+	for start, end, cat, cor, cor_len, coder in edits:
 		# Save coder in dict
 		if coder not in coder_dict.keys(): coder_dict[coder] = {}
 		
 		# Some filters based on args.
 		# Exclude uncorrected errors (UNK) in correction evaluation. Gold edits.
-		if not args.det_tok and not args.det_span and cat == "UNK": continue
+		if not args.det_tok and not args.det_span and cat == edit_sets.UNK: continue
 		# Only evaluate edits with more than one token on at least one side.
 		if args.multi and end-start < 2 and cor_len < 2: continue
 		
@@ -87,48 +124,50 @@ def extractEdits(sent, args):
 # Input 2: A dictionary of reference edits for a single annotator.
 # Output 1-3: The TP, FP and FN for the hyp vs the given ref annotator.
 # Output 4: A dictionary of the error type scores.
-def compareEdits(hyp_edits, ref_edits):	
+def compareEdits(hyp_edits, ref_edits):
 	tp = 0	# True Positives
 	fp = 0	# False Positives
 	fn = 0	# False Negatives
-	cat_dict = {} # {cat: [tp, fp, fn], ...} 
+	counts = {} # {cat id: [tp, fp, fn], ...}
 
 	for h_edit, h_cats in hyp_edits.items():
 		# noop hyp edits cannot be TP or FP
-		if h_cats[0] == "noop": continue
+		if h_cats[0] == edit_sets.NOOP: continue
 		# TRUE POSITIVES
-		if h_edit in ref_edits.keys():
+		if h_edit in ref_edits:
 			# On occasion, multiple tokens at same span.
 			for h_cat in ref_edits[h_edit]: # Use ref dict for TP
 				tp += 1
 				# Each dict value [TP, FP, FN]
-				if h_cat in cat_dict.keys():
-					cat_dict[h_cat][0] += 1
+				if h_cat in counts:
+					counts[h_cat][0] += 1
 				else:
-					cat_dict[h_cat] = [1, 0, 0]
+					counts[h_cat] = [1, 0, 0]
 		# FALSE POSITIVES
 		else:
 			# On occasion, multiple tokens at same span.
 			for h_cat in h_cats:
 				fp += 1
 				# Each dict value [TP, FP, FN]
-				if h_cat in cat_dict.keys():
-					cat_dict[h_cat][1] += 1
+				if h_cat in counts:
+					counts[h_cat][1] += 1
 				else:
-					cat_dict[h_cat] = [0, 1, 0]
+					counts[h_cat] = [0, 1, 0]
 	for r_edit, r_cats in ref_edits.items():
 		# noop ref edits cannot be FN
-		if r_cats[0] == "noop": continue
+		if r_cats[0] == edit_sets.NOOP: continue
 		# FALSE NEGATIVES
-		if r_edit not in hyp_edits.keys():
+		if r_edit not in hyp_edits:
 			# On occasion, multiple tokens at same span.
 			for r_cat in r_cats:
 				fn += 1
 				# Each dict value [TP, FP, FN]
-				if r_cat in cat_dict.keys():
-					cat_dict[r_cat][2] += 1
+				if r_cat in counts:
+					counts[r_cat][2] += 1
 				else:
-					cat_dict[r_cat] = [0, 0, 1]
+					counts[r_cat] = [0, 0, 1]
+	# Only the categories of this sentence are turned back into strings.
+	cat_dict = {edit_sets.CATS.strings[cat]: cnt for cat, cnt in counts.items()} # {cat: [tp, fp, fn], ...}
 	return tp, fp, fn, cat_dict
 	
 # Input 1-3: True positives, false positives, false negatives
@@ -178,60 +217,122 @@ def processCategories(cat_dict, setting):
 			return cat_dict
 	return proc_cat_dict
 
-	
-if __name__ == "__main__":
-	# Define and parse program input
-	parser = argparse.ArgumentParser(description="Calculate F-scores for error detection and/or correction "
-						"between HYP and REF M2 files.\nDefault behaviour evaluates "
-						"just correction in terms of spans.\nFlags let you evaluate "
-						"both span and token based detection etc.",
-						formatter_class=argparse.RawTextHelpFormatter,
-						usage="%(prog)s [options] -hyp HYP -ref REF")
-	parser.add_argument("-hyp", help="The hypothesis M2 file", required=True)
-	parser.add_argument("-ref", help="The reference M2 file", required=True)
-	parser.add_argument("-v", "--verbose", help="Print verbose output.", action="store_true", required=False)
-	parser.add_argument("-b", "--beta", help="Value of beta in F-score. (default: 0.5)",
-						default=0.5, type=float, required=False)
-	parser.add_argument("-multi", help="Only evaluate edits with >1 tokens on at least one side.",
-						action="store_true", required=False)						
-	parser.add_argument("-cat",	help="Show error category scores.\n"
-						"1: Only show overall first level category scores; e.g. R.\n"
-						"2: Only show overall non-first level category scores; e.g. NOUN.\n"
-						"3: Show all combinations of category scores; e.g. R:NOUN.",
-						choices=[1, 2, 3], type=int, required=False)
-	type_group = parser.add_mutually_exclusive_group(required=False)
-	type_group.add_argument("-dt", "--det_tok",	help="Evaluate Token-level Detection only.", 
-						action="store_true")
-	type_group.add_argument("-ds", "--det_span", help="Evaluate Span-level Detection only.", 
-						action="store_true")
-	type_group.add_argument("-cse", "--cor_span_err",
-						help="Evaluate Span-level Correction including error types.", action="store_true")
-	args = parser.parse_args()
+# Input 1: A list of generators of hyp m2 blocks; one for each hyp file.
+# Input 2: A generator of ref m2 blocks.
+# Output: A generator of (hyp blocks, ref block) tuples; one hyp block for each hyp file.
+def pairBlocks(hyp_m2s, ref_m2):
+	for sent in zip_longest(ref_m2, *hyp_m2s):
+		# Make sure they have the same number of sentences
+		assert None not in sent, "HYP and REF have a different number of sentences."
+		yield sent[1:], sent[0]
+
+# Input 1: A dictionary of hyp edits for each coder; see extractEdits.
+# Input 2: A dictionary of ref edits for each coder.
+# Input 3: Command line options.
+# Output: A list of (coder, tp, fp, fn, cat_dict, verbose_edits) tuples; one for each ref coder in order.
+# verbose_edits is a tuple of the sorted hyp and ref edits for verbose output, or None.
+def compareCoders(hyp_dict, ref_dict, args):
+	scores = []
+	for coder, ref_edits in ref_dict.items():
+		# Raw counts for a single annotator.
+		tp, fp, fn, cat_dict = compareEdits(hyp_dict[0], ref_edits)
+		verbose_edits = None
+		if args.verbose:
+			# Prepare verbose output edits.
+			hyp_verb = list(sorted(map(edit_sets.decodeEdit, hyp_dict[0].keys())))
+			ref_verb = list(sorted(map(edit_sets.decodeEdit, ref_edits.keys())))
+			if not hyp_verb or hyp_verb[0][0] == -1: hyp_verb = []
+			if not ref_verb or ref_verb[0][0] == -1: ref_verb = []
+			verbose_edits = (hyp_verb, ref_verb)
+		scores.append((coder, tp, fp, fn, cat_dict, verbose_edits))
+	return scores
 
-	# Load input files.
-	hyp_m2 = loadM2(args.hyp)
-	ref_m2 = loadM2(args.ref)
-	# Make sure they have the same number of sentences
-	assert len(hyp_m2) == len(ref_m2)
+# Input 1: A list of hyp m2 blocks of the same sentence; one for each hyp file.
+# Input 2: A ref m2 block, or a sentence of a reference index.
+# Input 3: Command line options.
+# Output: A list of lists of the compareCoders results of each hyp; one list for each evaluation mode.
+# The edits of each block are only parsed once for all modes, and the ref edits once for all hyps.
+def scoreSentence(hyp_sents, ref_sent, args):
+	hyp_edits = [parseEdits(hyp_sent) for hyp_sent in hyp_sents]
+	# A sentence from a reference index is already parsed.
+	if isinstance(ref_sent, ref_index.IndexSentence): ref_edits = ref_sent.edits
+	else: ref_edits = parseEdits(ref_sent)
+	mode_scores = []
+	for mode in evalModes(args):
+		# Process the edits according to the mode.
+		ref_dict = buildEdits(ref_edits, mode)
+		mode_scores.append([compareCoders(buildEdits(edits, mode), ref_dict, mode) for edits in hyp_edits])
+	return mode_scores
 
-	# Variables storing global TP, FP, FN and cat dicts
-	best_tp, best_fp, best_fn = 0, 0, 0
-	best_cat_dict = {}
-	
-	# Process each sentence
-	sents = zip(hyp_m2, ref_m2)
-	for sent_id, sent in enumerate(sents):
-		# Process the edits according to input args.
-		hyp_dict = extractEdits(sent[0], args)
-		ref_dict = extractEdits(sent[1], args)
-		# Compare the hyp against each ref and keep track of best so far.
+# Input: Command line options.
+# Output: A list of command line options for each evaluation mode.
+# With -all, there is one for each mode in MODES. Otherwise, it is just the args.
+def evalModes(args):
+	if not args.all: return [args]
+	modes = []
+	for det_tok, det_span, cor_span_err in MODES:
+		mode = Namespace(**vars(args))
+		mode.det_tok, mode.det_span, mode.cor_span_err = det_tok, det_span, cor_span_err
+		modes.append(mode)
+	return modes
+
+# Input: Command line options.
+# Output: The title of the evaluation mode.
+def modeTitle(args):
+	if args.det_tok: return " Token-Based Detection "
+	elif args.det_span: return " Span-Based Detection "
+	elif args.cor_span_err: return " Span-Based Correction + Classification "
+	else: return " Span-Based Correction "
+
+# Input 1: A list of (hyp blocks, ref block) tuples.
+# Input 2: Command line options.
+# Output: A list of the scoreSentence results of the tuples.
+def scoreChunk(chunk, args):
+	return [scoreSentence(hyp_sents, ref_sent, args) for hyp_sents, ref_sent in chunk]
+
+# Input 1: A list of paths to hyp m2 files.
+# Input 2: A path to a ref m2 file.
+# Input 3: Command line options.
+# Output: A generator of the scoreSentence results of each sentence in order.
+# Phase 1 of scoring: compare each hyp against each ref of each sentence.
+# This is independent for each sentence, so it can be done in parallel.
+# All the files are read in step, one sentence at a time.
+def scoreFiles(hyp_paths, ref_path, args):
+	hyp_m2s = [loadM2(hyp_path) for hyp_path in hyp_paths]
+	ref_m2 = loadRef(ref_path, args)
+	sents = pairBlocks(hyp_m2s, ref_m2)
+	if args.workers > 1:
+		chunks = workers.chunkBlocks(sents, CHUNK_SIZE)
+		return chain.from_iterable(workers.imapChunks(scoreChunk, chunks, args, None, args.workers))
+	return (scoreSentence(sent[0], sent[1], args) for sent in sents)
+
+# The global scores of a hyp file.
+# Phase 2 of scoring: the best ref of each sentence is chosen in order,
+# based on the global scores of the sentences before it.
+class Scorer(object):
+
+	def __init__(self, args):
+		self.args = args
+		# Variables storing global TP, FP, FN and cat dicts
+		self.tp, self.fp, self.fn = 0, 0, 0
+		self.cat_dict = {}
+		# The (tp, fp, fn) of each ref of each sentence for -bootstrap.
+		self.sent_counts = []
+
+	# Input 1: The index of the sentence.
+	# Input 2: The compareCoders result of the sentence.
+	# Add the scores of the best ref of the sentence to the global scores.
+	def add(self, sent_id, scores):
+		args = self.args
+		best_tp, best_fp, best_fn = self.tp, self.fp, self.fn
+		if args.bootstrap:
+			self.sent_counts.append([score[1:4] for score in scores])
+		# Keep track of the best ref so far.
 		best_coder = 0
 		tmp_f = -1
 		tmp_tp, tmp_fp, tmp_fn = 0, 0, 0
 		tmp_cat_dict = {}
-		for coder, ref_edits in ref_dict.items():
-			# Raw counts for a single annotator.
-			tp, fp, fn, cat_dict = compareEdits(hyp_dict[0], ref_edits)
+		for coder, tp, fp, fn, cat_dict, verbose_edits in scores:
 			# Score these cumulatively with previous global results.
 			p, r, f = computeFScore(tp+best_tp, fp+best_fp, fn+best_fn, args.beta)
 			# 1. Save sentence with highest F-score.
@@ -247,11 +348,7 @@ if __name__ == "__main__":
 				tmp_cat_dict = cat_dict
 			# Verbose output
 			if args.verbose:
-				# Prepare verbose output edits.
-				hyp_verb = list(sorted(hyp_dict[0].keys()))
-				ref_verb = list(sorted(ref_edits.keys()))
-				if not hyp_verb or hyp_verb[0][0] == -1: hyp_verb = []
-				if not ref_verb or ref_verb[0][0] == -1: ref_verb = []
+				hyp_verb, ref_verb = verbose_edits
 				# Print verbose info
 				print('{:-^40}'.format(""))
 				print("ANNOTATOR "+str(coder))
@@ -261,36 +358,286 @@ if __name__ == "__main__":
 				print("Global TP/FP/FN  :", str(tp+best_tp), str(fp+best_fp), str(fn+best_fn))
 				print("Global P/R/F"+str(args.beta)+"  :", str(p), str(r), str(f))
 		# Having processed all ref, save the best tp, fp, fn etc.
-		best_tp += tmp_tp
-		best_fp += tmp_fp
-		best_fn += tmp_fn
-		best_cat_dict = mergeDict(best_cat_dict, tmp_cat_dict)
+		self.tp += tmp_tp
+		self.fp += tmp_fp
+		self.fn += tmp_fn
+		self.cat_dict = mergeDict(self.cat_dict, tmp_cat_dict)
 		# Verbose output
 		if args.verbose:
 			print('{:-^40}'.format(""))
 			print("^^ Annotator "+str(best_coder)+" chosen for sentence "+str(sent_id))
 
-	# Prepare output title.
-	if args.det_tok: title = " Token-Based Detection "
-	elif args.det_span: title = " Span-Based Detection "
-	elif args.cor_span_err: title = " Span-Based Correction + Classification "
-	else: title = " Span-Based Correction "			
+	# Output: The global precision, recall and F-score rounded to 4dp.
+	def scores(self):
+		return computeFScore(self.tp, self.fp, self.fn, self.args.beta)
 
-	# Category Scores
-	if args.cat:
-		best_cat_dict = processCategories(best_cat_dict, args.cat)
+# Input 1: A list of Scorers; one for each hyp file.
+# Input 2: Command line options.
+# Output: A list of dictionaries of bootstrap results; one for each Scorer.
+# Keys are "prec_ci", "rec_ci" and "f_ci"; the confidence intervals of the scores.
+# All but the first also have "diff", "diff_ci" and "p_value"; the F-score of the first minus
+# the F-score of this one, its confidence interval and the paired bootstrap p-value.
+def bootstrapScores(scorers, args):
+	# NumPy is only needed for -bootstrap.
+	try:
+		import scripts.bootstrap as bootstrap
+	except ImportError:
+		print("Error: -bootstrap requires NumPy; see the readme.")
+		exit()
+	systems = [bootstrap.countArrays(scorer.sent_counts) for scorer in scorers]
+	totals = bootstrap.replay(systems, args.bootstrap, args.beta, args.seed)
+	samples = [bootstrap.computeFScores(totals[i, :, 0], totals[i, :, 1], totals[i, :, 2], args.beta) for i in range(len(systems))]
+	results = []
+	for scorer, (p, r, f) in zip(scorers, samples):
+		result = {"prec_ci": bootstrap.interval(p, args.ci),
+			"rec_ci": bootstrap.interval(r, args.ci),
+			"f_ci": bootstrap.interval(f, args.ci)}
+		if results:
+			diff = round(scorers[0].scores()[2]-scorer.scores()[2], 4)
+			result["diff"] = diff
+			result["diff_ci"] = bootstrap.interval(samples[0][2]-f, args.ci)
+			result["p_value"] = round(bootstrap.pairedPValue(samples[0][2], f, diff), 4)
+		results.append(result)
+	return results
+
+# Input 1: A list of the names of the hyp files.
+# Input 2: A list of Scorers; one for each hyp file.
+# Input 3: A list of bootstrapScores results.
+# Input 4: Command line options.
+# Print bootstrap confidence intervals of the scores, and compare each hyp with the first.
+def printBootstrap(names, scorers, results, args):
+	print('{:=^46}'.format(" Bootstrap: {} Samples ".format(args.bootstrap)))
+	print("\t".join(["", "Prec", "Rec", "F"+str(args.beta)]))
+	for name, scorer, result in zip(names, scorers, results):
+		print("\t".join([name]+[str(score) for score in scorer.scores()]))
+		print("\t".join([str(args.ci)+"% CI"]+["{:.4f}-{:.4f}".format(*result[key]) for key in ["prec_ci", "rec_ci", "f_ci"]]))
+	for name, result in zip(names[1:], results[1:]):
 		print("")
-		print('{:=^66}'.format(title))
-		print("Category".ljust(14), "TP".ljust(8), "FP".ljust(8), "FN".ljust(8), "P".ljust(8), "R".ljust(8), "F"+str(args.beta))
-		for cat, cnts in sorted(best_cat_dict.items()):
-			if cnts[0] + cnts[2] == 0: continue # Ignore hyp file placeholder error type.
-			cat_p, cat_r, cat_f = computeFScore(cnts[0], cnts[1], cnts[2], args.beta)
-			print(cat.ljust(14), str(cnts[0]).ljust(8), str(cnts[1]).ljust(8), str(cnts[2]).ljust(8), str(cat_p).ljust(8), str(cat_r).ljust(8), cat_f)
+		print(names[0]+"-"+name+" F"+str(args.beta)+" difference:", result["diff"])
+		print(str(args.ci)+"% CI:", "{:.4f}-{:.4f}".format(*result["diff_ci"]))
+		print("Paired bootstrap p-value:", result["p_value"])
+	print('{:=^46}'.format(""))
+	print("")
+
+# Input 1: A Scorer.
+# Input 2: The title of the evaluation mode.
+# Input 3: Command line options.
+# Print the category scores (with -cat) and the overall scores of a hyp.
+def printScores(scorer, title, args):
+	# Category Scores
+	for level in catLevels(args):
+		printCategories(scorer, title, level, args)
 
 	# Print the overall results.
 	print("")
 	print('{:=^46}'.format(title))
 	print("\t".join(["TP", "FP", "FN", "Prec", "Rec", "F"+str(args.beta)]))
-	print("\t".join(map(str, [best_tp, best_fp, best_fn]+list(computeFScore(best_tp, best_fp, best_fn, args.beta)))))
+	print("\t".join(map(str, [scorer.tp, scorer.fp, scorer.fn]+list(scorer.scores()))))
 	print('{:=^46}'.format(""))
-	print("")
\ No newline at end of file
+	print("")
+
+# Input 1: A Scorer.
+# Input 2: The title of the evaluation mode.
+# Input 3: The level of detail of the categories; see processCategories.
+# Input 4: Command line options.
+# Print the category scores of a hyp.
+def printCategories(scorer, title, level, args):
+	cat_dict = processCategories(scorer.cat_dict, level)
+	print("")
+	print('{:=^66}'.format(title))
+	print("Category".ljust(14), "TP".ljust(8), "FP".ljust(8), "FN".ljust(8), "P".ljust(8), "R".ljust(8), "F"+str(args.beta))
+	for cat, cnts in sorted(cat_dict.items()):
+		if cnts[0] + cnts[2] == 0: continue # Ignore hyp file placeholder error type.
+		cat_p, cat_r, cat_f = computeFScore(cnts[0], cnts[1], cnts[2], args.beta)
+		print(cat.ljust(14), str(cnts[0]).ljust(8), str(cnts[1]).ljust(8), str(cnts[2]).ljust(8), str(cat_p).ljust(8), str(cat_r).ljust(8), cat_f)
+
+# Input 1: A list of the names of the hyp files.
+# Input 2: A list of Scorers; one for each hyp file.
+# Input 3: A list of bootstrapScores results, or None.
+# Input 4: Command line options of the evaluation mode.
+# Print the score tables of an evaluation mode.
+def printResults(names, scorers, results, args):
+	title = modeTitle(args)
+	# One table for each hyp, as in previous versions.
+	if len(names) == 1 or args.hyp2:
+		printScores(scorers[0], title, args)
+		# Bootstrap confidence intervals and paired significance test.
+		if args.bootstrap:
+			printBootstrap(names, scorers, results, args)
+	# A table with one row for each hyp.
+	else:
+		for name, scorer in zip(names, scorers):
+			for level in catLevels(args):
+				printCategories(scorer, " "+name+":"+title, level, args)
+		printTable(names, scorers, results, title, args)
+
+# Input: Command line options.
+# Output: A list of the levels of detail of the category scores to show; see processCategories.
+# -all shows every level, unless -cat chooses one.
+def catLevels(args):
+	if args.cat: return [args.cat]
+	if args.all: return [1, 2, 3]
+	return []
+
+# Input 1: A list of the names of the hyp files.
+# Input 2: A list of Scorers; one for each hyp file.
+# Input 3: A list of bootstrapScores results, or None.
+# Input 4: The title of the evaluation mode.
+# Input 5: Command line options.
+# Print a table of the overall scores with one row for each hyp.
+def printTable(names, scorers, results, title, args):
+	header = ["HYP", "TP", "FP", "FN", "Prec", "Rec", "F"+str(args.beta)]
+	if results: header += ["F"+str(args.beta)+" "+str(args.ci)+"% CI", "Diff", "p-value"]
+	print("")
+	print('{:=^66}'.format(title))
+	print("\t".join(header))
+	for i, (name, scorer) in enumerate(zip(names, scorers)):
+		row = [name, scorer.tp, scorer.fp, scorer.fn]+list(scorer.scores())
+		if results:
+			row.append("{:.4f}-{:.4f}".format(*results[i]["f_ci"]))
+			row += [results[i]["diff"], results[i]["p_value"]] if i else ["-", "-"]
+		print("\t".join(map(str, row)))
+	print('{:=^66}'.format(""))
+	print("")
+
+# Input 1: A list of the names of the hyp files.
+# Input 2: A list of Scorers; one for each hyp file.
+# Input 3: A list of bootstrapScores results, or None.
+# Input 4: Command line options of the evaluation mode.
+# Output: A list of dictionaries of the scores of each hyp, for CSV or JSON output.
+# With -all, the rows also have the evaluation mode, and the categories are all combinations unless -cat is given.
+def scoreRows(names, scorers, results, args):
+	rows = []
+	level = args.cat or (3 if args.all else None)
+	for i, (name, scorer) in enumerate(zip(names, scorers)):
+		p, r, f = scorer.scores()
+		row = {"hyp": name, "tp": scorer.tp, "fp": scorer.fp, "fn": scorer.fn, "prec": p, "rec": r, "f": f}
+		if args.all: row["mode"] = modeTitle(args).strip()
+		if results: row.update(results[i])
+		if level:
+			cat_dict = processCategories(scorer.cat_dict, level)
+			row["cats"] = {}
+			for cat, cnts in sorted(cat_dict.items()):
+				if cnts[0] + cnts[2] == 0: continue # Ignore hyp file placeholder error type.
+				cat_p, cat_r, cat_f = computeFScore(cnts[0], cnts[1], cnts[2], args.beta)
+				row["cats"][cat] = {"tp": cnts[0], "fp": cnts[1], "fn": cnts[2], "prec": cat_p, "rec": cat_r, "f": cat_f}
+		rows.append(row)
+	return rows
+
+# Input 1: A list of scoreRows results.
+# Input 2: Command line options.
+# Print the scores as CSV; one line for the overall scores of each hyp,
+# and with -cat, one line for each category of each hyp.
+def printCSV(rows, args):
+	fields = ["hyp", "cat", "tp", "fp", "fn", "prec", "rec", "f"]
+	if args.all: fields = ["mode"]+fields
+	if args.bootstrap: fields += ["prec_ci", "rec_ci", "f_ci", "diff", "diff_ci", "p_value"]
+	writer = csv.writer(sys.stdout)
+	writer.writerow(fields)
+	for row in rows:
+		lines = [dict(row, cat="")]+[dict(cat_row, hyp=row["hyp"], mode=row.get("mode"), cat=cat) for cat, cat_row in row.get("cats", {}).items()]
+		for line in lines:
+			writer.writerow([formatField(line.get(field, "")) for field in fields])
+
+# Input: A value in a CSV field.
+# Output: The value as a string; confidence intervals are written as "low-high".
+def formatField(value):
+	if isinstance(value, tuple): return "{:.4f}-{:.4f}".format(*value)
+	return str(value)
+
+# Input 1: A list of paths to hyp m2 files or glob patterns.
+# Output: A list of paths to hyp m2 files; each pattern is replaced by the files that match it in sorted order.
+def expandPaths(paths):
+	expanded = []
+	for path in paths:
+		expanded.extend(sorted(glob.glob(path)) or [path])
+	return expanded
+
+	
+if __name__ == "__main__":
+	# Define and parse program input
+	parser = argparse.ArgumentParser(description="Calculate F-scores for error detection and/or correction "
+						"between HYP and REF M2 files.\nDefault behaviour evaluates "
+						"just correction in terms of spans.\nFlags let you evaluate "
+						"both span and token based detection etc.",
+						formatter_class=argparse.RawTextHelpFormatter,
+						usage="%(prog)s [options] -hyp HYP [HYP ...] -ref REF")
+	parser.add_argument("-hyp", help="The hypothesis M2 file, or several files or glob patterns to score them all\n"
+						"against REF in one pass.", nargs="+", required=True)
+	parser.add_argument("-ref", help="The reference M2 file", required=True)
+	parser.add_argument("-v", "--verbose", help="Print verbose output.", action="store_true", required=False)
+	parser.add_argument("-b", "--beta", help="Value of beta in F-score. (default: 0.5)",
+						default=0.5, type=float, required=False)
+	parser.add_argument("-multi", help="Only evaluate edits with >1 tokens on at least one side.",
+						action="store_true", required=False)						
+	parser.add_argument("-cat",	help="Show error category scores.\n"
+						"1: Only show overall first level category scores; e.g. R.\n"
+						"2: Only show overall non-first level category scores; e.g. NOUN.\n"
+						"3: Show all combinations of category scores; e.g. R:NOUN.",
+						choices=[1, 2, 3], type=int, required=False)
+	type_group = parser.add_mutually_exclusive_group(required=False)
+	type_group.add_argument("-dt", "--det_tok",	help="Evaluate Token-level Detection only.", 
+						action="store_true")
+	type_group.add_argument("-ds", "--det_span", help="Evaluate Span-level Detection only.", 
+						action="store_true")
+	type_group.add_argument("-cse", "--cor_span_err",
+						help="Evaluate Span-level Correction including error types.", action="store_true")
+	parser.add_argument("-workers", help="Compare the edits of sentences in this many worker processes. (default: 1)",
+						default=1, type=int, required=False)
+	parser.add_argument("-bootstrap", help="Compute confidence intervals from this many bootstrap resamples of the\n"
+						"sentences. Requires NumPy.", type=int, required=False)
+	parser.add_argument("-hyp2", help="A second hypothesis M2 file to compare with HYP in a paired bootstrap test.",
+						required=False)
+	parser.add_argument("-ci", help="The confidence level of the intervals in percent. (default: 95)",
+						default=95, type=float, required=False)
+	parser.add_argument("-seed", help="The random seed of the bootstrap resamples. (default: 0)",
+						default=0, type=int, required=False)
+	parser.add_argument("-all", help="Evaluate span-based correction (with and without error types), span-based detection\n"
+						"and token-based detection in one pass, with every level of category scores.",
+						action="store_true", required=False)
+	parser.add_argument("-ref_index", help="An index of REF made with index_m2.py. It is used instead of reading REF,\n"
+						"unless REF has changed since it was made.", required=False)
+	parser.add_argument("-format", help="The output format. (default: table)\n"
+						"table: Tables of scores; with several -hyp files, one row for each file.\n"
+						"csv: One CSV line for each -hyp file (and category with -cat).\n"
+						"json: A JSON list with one object for each -hyp file.",
+						choices=["table", "csv", "json"], default="table", required=False)
+	args = parser.parse_args()
+
+	# The hyp files. With -hyp2, there are exactly two and they are called HYP and HYP2.
+	hyp_paths = expandPaths(args.hyp)
+	names = hyp_paths
+	if args.hyp2:
+		if len(hyp_paths) > 1 or not args.bootstrap:
+			print("Error: -hyp2 requires -bootstrap and one -hyp file.")
+			exit()
+		hyp_paths = hyp_paths+[args.hyp2]
+		names = ["HYP", "HYP2"]
+	if args.verbose and len(hyp_paths) > 1:
+		print("Error: -v only works with one -hyp file.")
+		exit()
+
+	if args.all and (args.det_tok or args.det_span or args.cor_span_err or args.verbose):
+		print("Error: -all cannot be used with -dt, -ds, -cse or -v.")
+		exit()
+
+	# Score the hyps against the ref in one pass over the files.
+	# With -all, each evaluation mode has its own Scorers.
+	modes = evalModes(args)
+	scorers = [[Scorer(mode) for hyp_path in hyp_paths] for mode in modes]
+	for sent_id, sent_scores in enumerate(scoreFiles(hyp_paths, args.ref, args)):
+		for mode_scorers, mode_scores in zip(scorers, sent_scores):
+			for scorer, scores in zip(mode_scorers, mode_scores):
+				scorer.add(sent_id, scores)
+
+	rows = []
+	for mode, mode_scorers in zip(modes, scorers):
+		results = bootstrapScores(mode_scorers, mode) if args.bootstrap else None
+		if args.format == "table":
+			printResults(names, mode_scorers, results, mode)
+		else:
+			rows += scoreRows(names, mode_scorers, results, mode)
+	if args.format == "csv":
+		printCSV(rows, args)
+	elif args.format == "json":
+		print(json.dumps(rows, indent=1))
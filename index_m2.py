@@ -0,0 +1,23 @@
+import argparse
+import compare_m2
+import scripts.ref_index as ref_index
+
+def main(args):
+	out = args.out or args.ref+".idx"
+	# Parse the edits of each sentence and save them as they are read.
+	sents = (compare_m2.parseEdits(sent) for sent in compare_m2.loadM2(args.ref))
+	count = ref_index.writeIndex(out, args.ref, sents)
+	print("Saved an index of {} sentences to {}".format(count, out))
+
+if __name__ == "__main__":
+	# Define and parse program input
+	parser = argparse.ArgumentParser(description="Compile a reference M2 file into a binary index for compare_m2.py -ref_index.\n"
+								"The index holds the parsed edits of each sentence, so the reference does not\n"
+								"have to be parsed again each time a hypothesis is scored.",
+								formatter_class=argparse.RawTextHelpFormatter,
+								usage="%(prog)s [-h] -ref REF [-out OUT]")
+	parser.add_argument("-ref", help="The reference M2 file.", required=True)
+	parser.add_argument("-out", help="The output filepath. (default: REF.idx)")
+	args = parser.parse_args()
+	# Run the program.
+	main(args)
@@ -0,0 +1,57 @@
+import argparse
+import json
+import socket
+import time
+from contextlib import ExitStack
+
+def main(args):
+	# Round trip times of the requests in seconds.
+	times = []
+	with ExitStack() as stack:
+		in_files = [stack.enter_context(open(i)) for i in [args.orig]+args.cor]
+		out_file = stack.enter_context(open(args.out, "w"))
+		sock = stack.enter_context(socket.socket(socket.AF_UNIX, socket.SOCK_STREAM))
+		sock.connect(args.socket)
+		replies = sock.makefile("r", encoding="utf-8")
+		# Send one request per line of the input files and wait for each reply.
+		for line in zip(*in_files):
+			line = [sent.strip() for sent in line]
+			# Skip any line where the orig sent is empty, as in parallel_to_m2.py
+			if not line[0]: continue
+			request = {"orig": line[0], "cor": line[1:], "format": "json" if args.json else "m2"}
+			start = time.time()
+			sock.sendall((json.dumps(request)+"\n").encode("utf-8"))
+			reply = replies.readline()
+			times.append(time.time()-start)
+			if not reply:
+				raise SystemExit("The server closed the connection.")
+			reply = json.loads(reply)
+			if "error" in reply:
+				raise SystemExit(reply["error"])
+			if args.json: out_file.write(json.dumps(reply)+"\n")
+			else: out_file.write(reply["m2"])
+	if args.latency and times:
+		print(latencySummary(times))
+
+# Input: A list of round trip times in seconds.
+# Output: A summary of the median and 99th percentile latency in milliseconds.
+def latencySummary(times):
+	times = sorted(times)
+	p50 = times[int(0.5*(len(times)-1))]
+	p99 = times[int(0.99*(len(times)-1))]
+	return "Requests: {}, p50: {:.1f} ms, p99: {:.1f} ms".format(len(times), 1000*p50, 1000*p99)
+
+if __name__ == "__main__":
+	# Define and parse program input
+	parser = argparse.ArgumentParser(description="Send parallel original and corrected text files (1 sentence per line) to m2_server.py\nand save the M2 output. The text is assumed to be tokenized.",
+								formatter_class=argparse.RawTextHelpFormatter,
+								usage="%(prog)s [-h] [options] -socket SOCKET -orig ORIG -cor COR [COR ...] -out OUT")
+	parser.add_argument("-socket", help="The path of the Unix domain socket of the server.", required=True)
+	parser.add_argument("-orig", help="The path to the original text file.", required=True)
+	parser.add_argument("-cor", help="The paths to >= 1 corrected text files.", nargs="+", default=[], required=True)
+	parser.add_argument("-out", help="The output filepath.", required=True)
+	parser.add_argument("-json", help="Save one JSON object of edits per sentence instead of M2.", action="store_true")
+	parser.add_argument("-latency", help="Print the median and 99th percentile time per sentence.", action="store_true")
+	args = parser.parse_args()
+	# Run the program.
+	main(args)
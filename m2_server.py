@@ -0,0 +1,139 @@
+import argparse
+import json
+import os
+import socket
+import socketserver
+import threading
+import parallel_to_m2
+import scripts.resources as resources
+import scripts.spacy_cache as spacy_cache
+
+def main(args):
+	# Get base working directory.
+	basename = os.path.dirname(os.path.realpath(__file__))
+	print("Loading resources...")
+	# Load the resources once; every request reuses them.
+	loaded = resources.loadResources(basename)
+	# Remove the socket of a server that is no longer running.
+	if os.path.exists(args.socket):
+		if isRunning(args.socket):
+			raise SystemExit("A server is already listening on "+args.socket)
+		os.remove(args.socket)
+	server = AnnotationServer(args.socket, args, loaded)
+	print("Listening on "+args.socket)
+	try:
+		server.serve_forever()
+	except KeyboardInterrupt:
+		pass
+	finally:
+		server.server_close()
+		os.remove(args.socket)
+
+# Input: The path to a Unix domain socket.
+# Output: Boolean; a server accepts connections on the socket.
+def isRunning(path):
+	with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+		try:
+			sock.connect(path)
+			return True
+		except OSError:
+			return False
+
+# A server that annotates parallel sentences sent over a Unix domain socket.
+# Each client connection is handled in its own thread, so many clients can be connected at once.
+# Annotation itself is done one request at a time, since spacy and the caches are shared, so requests
+# from different clients are serialised; run one server per core for more throughput.
+class AnnotationServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+
+	daemon_threads = True
+
+	def __init__(self, path, args, loaded):
+		socketserver.UnixStreamServer.__init__(self, path, RequestHandler)
+		self.args = args
+		self.resources = loaded
+		self.lock = threading.Lock()
+
+	# Input: A request dictionary; see RequestHandler.
+	# Output: A reply dictionary.
+	def annotate(self, request):
+		checkRequest(request)
+		cor_sents = request["cor"]
+		if isinstance(cor_sents, str): cor_sents = [cor_sents]
+		line = [request["orig"]]+cor_sents
+		with self.lock:
+			m2 = parallel_to_m2.processChunk([line], self.args, *self.resources)
+		if request.get("format", "m2") == "json":
+			return {"orig": request["orig"].split(), "edits": m2ToEdits(m2)}
+		return {"m2": m2}
+
+# Input: A request dictionary; see RequestHandler.
+# Raises a ValueError if a field is missing or has the wrong type, so the client gets an error reply.
+def checkRequest(request):
+	if not isinstance(request, dict):
+		raise ValueError("The request must be a JSON object.")
+	if not isinstance(request.get("orig"), str):
+		raise ValueError("orig must be a string.")
+	cor_sents = request.get("cor")
+	if isinstance(cor_sents, str): cor_sents = [cor_sents]
+	if not isinstance(cor_sents, list) or not all(isinstance(cor_sent, str) for cor_sent in cor_sents):
+		raise ValueError("cor must be a string or a list of strings.")
+	if request.get("format", "m2") not in {"m2", "json"}:
+		raise ValueError("format must be m2 or json.")
+
+# The protocol is one JSON object per line in each direction.
+# Request: {"orig": "tokenized orig sent", "cor": ["tokenized cor sent", ...], "format": "m2" or "json"}
+# Reply: {"m2": "m2 block"}, {"orig": [tokens], "edits": [edits]} or {"error": "message"}
+class RequestHandler(socketserver.StreamRequestHandler):
+
+	def handle(self):
+		for line in self.rfile:
+			if not line.strip(): continue
+			try:
+				reply = self.server.annotate(json.loads(line.decode("utf-8")))
+			except ValueError as e:
+				reply = {"error": "Bad request: "+str(e)}
+			# Any other failure is reported too, so one bad request does not close the connection.
+			except Exception as e:
+				reply = {"error": "Failed to annotate: "+repr(e)}
+			self.wfile.write((json.dumps(reply)+"\n").encode("utf-8"))
+
+# Input: An m2 block for one original sentence.
+# Output: A list of edit dictionaries with the keys start, end, type, cor and coder.
+def m2ToEdits(m2):
+	edits = []
+	for line in m2.split("\n"):
+		if not line.startswith("A "): continue
+		edit = line[2:].split("|||")
+		span = edit[0].split()
+		edits.append({"start": int(span[0]), "end": int(span[1]), "type": edit[1], "cor": edit[2], "coder": int(edit[-1])})
+	return edits
+
+if __name__ == "__main__":
+	# Define and parse program input
+	parser = argparse.ArgumentParser(description="Load ERRANT once and annotate parallel sentences sent over a Unix domain socket.\nSee m2_client.py for a client.",
+								formatter_class=argparse.RawTextHelpFormatter,
+								usage="%(prog)s [-h] [options] -socket SOCKET")
+	parser.add_argument("-socket", help="The path of the Unix domain socket to listen on.", required=True)
+	parser.add_argument("-lev", help="Use standard Levenshtein to align sentences.", action="store_true")
+	parser.add_argument("-merge", choices=["rules", "all-split", "all-merge", "all-equal"], default="rules",
+						help="Choose a merging strategy for automatic alignment.\n"
+							"rules: Use a rule-based merging strategy (default)\n"
+							"all-split: Merge nothing; e.g. MSSDI -> M, S, S, D, I\n"
+							"all-merge: Merge adjacent non-matches; e.g. MSSDI -> M, SSDI\n"
+							"all-equal: Merge adjacent same-type non-matches; e.g. MSSDI -> M, SS, D, I")
+	parser.add_argument("-batch_size", help="The number of sentences to markup with spacy at once. (default: 100)", default=100, type=int)
+	parser.add_argument("-band", help="Only fill in the alignment table within a band of this many cells around the\n"
+							"diagonal. The band is widened whenever an alignment outside it could be as good,\n"
+							"so the output is unchanged. Without a value, the width is based on the sentence lengths.",
+							nargs="?", const=0, type=int)
+	parser.add_argument("-cache_dir", help="A directory to keep spacy annotated sentences in and reuse them from.")
+	parser.add_argument("-cache_size", help="The maximum size of the cache directory in MB. (default: {})".format(spacy_cache.CACHE_SIZE),
+							default=spacy_cache.CACHE_SIZE, type=int)
+	parser.add_argument("-max_transposition", help="The maximum number of tokens in a transposition. (default: no maximum)", type=int)
+	parser.add_argument("-result_cache", help="The maximum number of sentence pairs whose edits are kept and reused for\n"
+							"duplicate pairs. (default: 100000)", default=100000, type=int)
+	parser.add_argument("-lazy_parse", help="Only POS tag sentences up front, and parse a sentence the first time\n"
+							"its dependency labels are needed to classify an edit.", action="store_true")
+	args = parser.parse_args()
+	# Run the program.
+	main(args)
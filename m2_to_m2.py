@@ -1,57 +1,116 @@
 import argparse
 import os
-import spacy
-from nltk.stem.lancaster import LancasterStemmer
+import time
 import scripts.align_text as align_text
 import scripts.cat_rules as cat_rules
+import scripts.profiler as profiler
+import scripts.resources as resources
+import scripts.spacy_cache as spacy_cache
 import scripts.toolbox as toolbox
+import scripts.workers as workers
 
 def main(args):
 	# Get base working directory.
 	basename = os.path.dirname(os.path.realpath(__file__))
+	# Time each stage, and show the progress against the number of sentences in the input.
+	if args.profile is not None:
+		profiler.enable(args.slow_log)
+		with open(args.m2) as in_file:
+			progress = profiler.Progress(sum([1 for line in in_file if line.startswith("S ")]))
+	run_start = time.perf_counter()
 	print("Loading resources...")
-	# Load Tokenizer and other resources
-	nlp = spacy.load("en")
-	# Lancaster Stemmer
-	stemmer = LancasterStemmer()
-	# GB English word list (inc -ise and -ize)
-	gb_spell = toolbox.loadDictionary(basename+"/resources/en_GB-large.txt")
-	# Part of speech map file
-	tag_map = toolbox.loadTagMap(basename+"/resources/en-ptb_map")	
+	# Workers load their own resources, so only load them here in serial mode.
+	if args.workers <= 1:
+		nlp, stemmer, gb_spell, tag_map = resources.loadResources(basename)
+		if profiler.ENABLED: profiler.addTime("load", run_start)
 	# Setup output m2 file
 	out_m2 = open(args.out, "w")
 
 	print("Processing files...")
-	# Open the m2 file and split into sentence+edit chunks.
-	m2_file = open(args.m2).read().strip().split("\n\n")
-	for info in m2_file:
-		# Get the original and corrected sentence + edits for each annotator.
-		orig_sent, coder_dict = toolbox.processM2(info)
+	# Read the m2 file one sentence+edit block at a time.
+	m2_file = toolbox.readM2(args.m2)
+	# Process the sentence+edit blocks in chunks of sentences.
+	# Process the chunks in parallel, but write them in input order.
+	if args.workers > 1:
+		chunks = workers.chunkBlocks(m2_file, args.batch_size, blockCost)
+		out_chunks = workers.imapChunks(processChunk, chunks, args, basename, args.workers)
+	else:
+		chunks = workers.chunkBlocks(m2_file, args.batch_size)
+		out_chunks = (processChunk(chunk, args, nlp, stemmer, gb_spell, tag_map) for chunk in chunks)
+	for out_chunk in out_chunks:
+		if profiler.ENABLED: write_start = time.perf_counter()
+		out_m2.write(out_chunk)
+		if profiler.ENABLED:
+			profiler.addTime("write", write_start)
+			progress.update(toolbox.STATS["profile_sentences"])
+	if profiler.ENABLED: progress.finish()
+	if args.band is not None:
+		print(align_text.bandSummary())
+	# Report how often cached annotations, costs and word features were reused.
+	for cache in ["annotation", "substitution", "char", "word"]:
+		if toolbox.cacheSummary(cache):
+			print(toolbox.cacheSummary(cache))
+	if toolbox.parseSummary():
+		print(toolbox.parseSummary())
+	if profiler.ENABLED:
+		profile = profiler.report(time.perf_counter()-run_start, toolbox.STATS["profile_sentences"])
+		profiler.saveReport(profile, args.profile or args.out+".profile.json")
+
+# Input: A sentence+edit block in an m2 file.
+# Output: An estimate of the cost of processing it.
+def blockCost(block):
+	orig_len = block.lines[0].count(" ")
+	coders = set([edit.rsplit("|||", 1)[-1] for edit in block.lines[1:]])
+	return orig_len*orig_len*max(1, len(coders))
+
+# Input 1: A list of sentence+edit blocks in an m2 file.
+# Input 2: Command line args.
+# Input 3: A preloaded spacy processing object.
+# Input 4: The Lancaster stemmer in NLTK.
+# Input 5: A set of valid GB English words.
+# Input 6: A dictionary to map PTB tags to Stanford Universal Dependency tags.
+# Output: The m2 formatted sentences and edits for the chunk.
+def processChunk(chunk, args, nlp, stemmer, gb_spell, tag_map):
+	out_m2 = []
+	if profiler.ENABLED: toolbox.addStat("profile_sentences", len(chunk))
+	# Get the original and corrected sentence + edits for each annotator.
+	chunk = [(block.orig_sent, block.coder_dict) for block in chunk]
+	# Collect the orig and cor sentences that need markup, in the order they are used.
+	spacy_sents = []
+	for orig_sent, coder_dict in chunk:
+		cor_sents = [coder_info[0] for coder, coder_info in sorted(coder_dict.items()) if coder_info[1][0][2] != "noop"]
+		if cor_sents: spacy_sents.extend([orig_sent]+cor_sents)
+	# Markup all the sentences in the chunk with spacy at once (assume tokenized)
+	if profiler.ENABLED: stage_start = time.perf_counter()
+	cache = spacy_cache.getCache(args.cache_dir, args.cache_size, nlp)
+	proc_sents = iter(toolbox.applySpacyBatch(spacy_sents, nlp, args.batch_size, cache, not args.lazy_parse))
+	if profiler.ENABLED: profiler.addTime("spacy", stage_start)
+	for orig_sent, coder_dict in chunk:
 		# Write the orig_sent to the output m2 file.
-		out_m2.write("S "+" ".join(orig_sent)+"\n")
+		out_m2.append("S "+" ".join(orig_sent)+"\n")
 		# Only process sentences with edits.
 		if coder_dict:
 			# Save marked up original sentence here, if required.
-			proc_orig = ""
+			proc_orig = None
 			# Loop through the annotators
 			for coder, coder_info in sorted(coder_dict.items()):
-				cor_sent = coder_info[0]
 				gold_edits = coder_info[1]
 				# If there is only 1 edit and it is noop, just write it.
 				if gold_edits[0][2] == "noop":
-					out_m2.write(toolbox.formatEdit(gold_edits[0], coder)+"\n")				
+					out_m2.append(toolbox.formatEdit(gold_edits[0], coder)+"\n")				
 					continue
-				# Markup the orig and cor sentence with spacy (assume tokenized)
+				# Get the marked up orig and cor sentence.
 				# Orig is marked up only once for the first coder that needs it.
-				proc_orig = toolbox.applySpacy(orig_sent, nlp) if not proc_orig else proc_orig
-				proc_cor = toolbox.applySpacy(cor_sent, nlp)
+				proc_orig = next(proc_sents) if proc_orig is None else proc_orig
+				proc_cor = next(proc_sents)
+				if profiler.ENABLED: pair_start = stage_start = time.perf_counter()
 				# Loop through gold edits.
 				for gold_edit in gold_edits:
 					# Um and UNK edits (uncorrected errors) are always preserved.
 					if gold_edit[2] in {"Um", "UNK"}:
 						# Um should get changed to UNK unless using old categories.
 						if gold_edit[2] == "Um" and not args.old_cats: gold_edit[2] = "UNK"
-						out_m2.write(toolbox.formatEdit(gold_edit, coder)+"\n")				
+						out_m2.append(toolbox.formatEdit(gold_edit, coder)+"\n")				
 					# Gold edits
 					elif args.gold:
 						# Minimise the edit; e.g. [has eaten -> was eaten] = [has -> was]
@@ -64,20 +123,25 @@ def main(args):
 							cat = cat_rules.autoTypeEdit(gold_edit, proc_orig, proc_cor, gb_spell, tag_map, nlp, stemmer)
 							gold_edit[2] = cat
 						# Write the edit to the output m2 file.
-						out_m2.write(toolbox.formatEdit(gold_edit, coder)+"\n")
+						out_m2.append(toolbox.formatEdit(gold_edit, coder)+"\n")
 				# Auto edits
 				if args.auto:
 					# Auto align the parallel sentences and extract the edits.
 					auto_edits = align_text.getAutoAlignedEdits(proc_orig, proc_cor, nlp, args)				
+					if profiler.ENABLED: stage_start = time.perf_counter()
 					# Loop through the edits.
 					for auto_edit in auto_edits:
 						# Give each edit an automatic error type.
 						cat = cat_rules.autoTypeEdit(auto_edit, proc_orig, proc_cor, gb_spell, tag_map, nlp, stemmer)
 						auto_edit[2] = cat
 						# Write the edit to the output m2 file.
-						out_m2.write(toolbox.formatEdit(auto_edit, coder)+"\n")
+						out_m2.append(toolbox.formatEdit(auto_edit, coder)+"\n")
+				# Log the time taken to classify (and align) the edits of the coder.
+				if profiler.ENABLED:
+					profiler.addSlow(profiler.addTime("auto_type", stage_start)-pair_start, " ".join(orig_sent), " ".join(coder_info[0]))
 		# Write a newline when there are no more coders.
-		out_m2.write("\n")
+		out_m2.append("\n")
+	return "".join(out_m2)
 
 if __name__ == "__main__":
 	# Define and parse program input
@@ -98,5 +162,21 @@ if __name__ == "__main__":
 								"all-split: Merge nothing; e.g. MSSDI -> M, S, S, D, I\n"
 								"all-merge: Merge adjacent non-matches; e.g. MSSDI -> M, SSDI\n"
 								"all-equal: Merge adjacent same-type non-matches; e.g. MSSDI -> M, SS, D, I")
+	parser.add_argument("-batch_size", help="The number of sentences to markup with spacy at once. (default: 100)", default=100, type=int)
+	parser.add_argument("-workers", help="The number of worker processes. (default: 1)", default=1, type=int)
+	parser.add_argument("-band", help="Only fill in the alignment table within a band of this many cells around the\n"
+							"diagonal. The band is widened whenever an alignment outside it could be as good,\n"
+							"so the output is unchanged. Without a value, the width is based on the sentence lengths.",
+							nargs="?", const=0, type=int)
+	parser.add_argument("-cache_dir", help="A directory to keep spacy annotated sentences in and reuse them from.")
+	parser.add_argument("-cache_size", help="The maximum size of the cache directory in MB. (default: {})".format(spacy_cache.CACHE_SIZE),
+							default=spacy_cache.CACHE_SIZE, type=int)
+	parser.add_argument("-max_transposition", help="The maximum number of tokens in a transposition. (default: no maximum)", type=int)
+	parser.add_argument("-lazy_parse", help="Only POS tag sentences up front, and parse a sentence the first time\n"
+							"its dependency labels are needed to classify an edit.", action="store_true")
+	parser.add_argument("-profile", help="Time each stage of processing, show progress as it runs and save the timings,\n"
+							"the slowest sentence pairs and other counts to a JSON file. (default: OUT.profile.json)",
+							nargs="?", const="", metavar="JSON")
+	parser.add_argument("-slow_log", help="The number of slowest sentence pairs in the profile. (default: 10)", default=10, type=int)
 	args = parser.parse_args()
 	main(args)
\ No newline at end of file
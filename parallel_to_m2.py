@@ -1,24 +1,33 @@
 import argparse
 import os
-import spacy
+import time
 from contextlib import ExitStack
-from nltk.stem.lancaster import LancasterStemmer
 import scripts.align_text as align_text
 import scripts.cat_rules as cat_rules
+import scripts.profiler as profiler
+import scripts.resources as resources
+import scripts.spacy_cache as spacy_cache
 import scripts.toolbox as toolbox
+import scripts.workers as workers
+
+# The typed edits of (orig, cor) sentence pairs that were already annotated.
+# Duplicate pairs, e.g. several annotators making the same correction, are only annotated once.
+RESULT_CACHE = toolbox.LRUCache("result", 100000)
 
 def main(args):
 	# Get base working directory.
 	basename = os.path.dirname(os.path.realpath(__file__))
+	# Time each stage, and show the progress against the number of input lines.
+	if args.profile is not None:
+		profiler.enable(args.slow_log)
+		with open(args.orig) as orig_file:
+			progress = profiler.Progress(sum([1 for line in orig_file]))
+	run_start = time.perf_counter()
 	print("Loading resources...")
-	# Load Tokenizer and other resources
-	nlp = spacy.load("en")
-	# Lancaster Stemmer
-	stemmer = LancasterStemmer()
-	# GB English word list (inc -ise and -ize)
-	gb_spell = toolbox.loadDictionary(basename+"/resources/en_GB-large.txt")
-	# Part of speech map file
-	tag_map = toolbox.loadTagMap(basename+"/resources/en-ptb_map")
+	# Workers load their own resources, so only load them here in serial mode.
+	if args.workers <= 1:
+		nlp, stemmer, gb_spell, tag_map = resources.loadResources(basename)
+		if profiler.ENABLED: profiler.addTime("load", run_start)
 	# Setup output m2 file
 	out_m2 = open(args.out, "w")
 
@@ -27,37 +36,142 @@ def main(args):
 	print("Processing files...")	
 	with ExitStack() as stack:
 		in_files = [stack.enter_context(open(i)) for i in [args.orig]+args.cor]
-		# Process each line of all input files.
-		for line_id, line in enumerate(zip(*in_files)):
-			orig_sent = line[0].strip()
-			cor_sents = line[1:]
-			# If orig sent is empty, skip the line
-			if not orig_sent: continue
-			# Write the original sentence to the output m2 file.
-			out_m2.write("S "+orig_sent+"\n")
-			# Markup the original sentence with spacy (assume tokenized)
-			proc_orig = toolbox.applySpacy(orig_sent.split(), nlp)
-			# Loop through the corrected sentences
-			for cor_id, cor_sent in enumerate(cor_sents):
-				cor_sent = cor_sent.strip()
-				# Identical sentences have no edits, so just write noop.
-				if orig_sent == cor_sent:
-					out_m2.write("A -1 -1|||noop|||-NONE-|||REQUIRED|||-NONE-|||"+str(cor_id)+"\n")
-				# Otherwise, do extra processing.
-				else:
-					# Markup the corrected sentence with spacy (assume tokenized)
-					proc_cor = toolbox.applySpacy(cor_sent.strip().split(), nlp)
-					# Auto align the parallel sentences and extract the edits.
-					auto_edits = align_text.getAutoAlignedEdits(proc_orig, proc_cor, nlp, args)
-					# Loop through the edits.
-					for auto_edit in auto_edits:
-						# Give each edit an automatic error type.
-						cat = cat_rules.autoTypeEdit(auto_edit, proc_orig, proc_cor, gb_spell, tag_map, nlp, stemmer)
-						auto_edit[2] = cat
-						# Write the edit to the output m2 file.
-						out_m2.write(toolbox.formatEdit(auto_edit, cor_id)+"\n")
-			# Write a newline when we have processed all corrections for a given sentence.
-			out_m2.write("\n")
+		# Process the lines of all input files in chunks of sentences.
+		# Process the chunks in parallel, but write them in input order.
+		if args.workers > 1:
+			chunks = workers.chunkBlocks(zip(*in_files), args.batch_size, blockCost)
+			out_chunks = workers.imapChunks(processChunk, chunks, args, basename, args.workers)
+		else:
+			chunks = workers.chunkBlocks(zip(*in_files), args.batch_size)
+			out_chunks = (processChunk(chunk, args, nlp, stemmer, gb_spell, tag_map) for chunk in chunks)
+		for out_chunk in out_chunks:
+			if profiler.ENABLED: write_start = time.perf_counter()
+			out_m2.write(out_chunk)
+			if profiler.ENABLED:
+				profiler.addTime("write", write_start)
+				progress.update(toolbox.STATS["profile_sentences"])
+	if profiler.ENABLED: progress.finish()
+	if args.band is not None:
+		print(align_text.bandSummary())
+	# Report how often cached annotations, costs and word features were reused.
+	for cache in ["annotation", "substitution", "char", "word"]:
+		if toolbox.cacheSummary(cache):
+			print(toolbox.cacheSummary(cache))
+	if resultSummary():
+		print(resultSummary())
+	if toolbox.parseSummary():
+		print(toolbox.parseSummary())
+	if profiler.ENABLED:
+		profile = profiler.report(time.perf_counter()-run_start, toolbox.STATS["profile_sentences"])
+		profiler.saveReport(profile, args.profile or args.out+".profile.json")
+
+# Input: A tuple of an original line and its corrected lines.
+# Output: An estimate of the cost of aligning them.
+def blockCost(line):
+	orig_len = line[0].count(" ")+1
+	return sum([orig_len*(cor_sent.count(" ")+1) for cor_sent in line[1:]])
+
+# Input 1: A list of tuples of an original line and its corrected lines.
+# Input 2: Command line args.
+# Input 3: A preloaded spacy processing object.
+# Input 4: The Lancaster stemmer in NLTK.
+# Input 5: A set of valid GB English words.
+# Input 6: A dictionary to map PTB tags to Stanford Universal Dependency tags.
+# Output: The m2 formatted sentences and edits for the chunk.
+def processChunk(chunk, args, nlp, stemmer, gb_spell, tag_map):
+	out_m2 = []
+	if profiler.ENABLED: toolbox.addStat("profile_sentences", len(chunk))
+	# Strip the lines and skip any line where the orig sent is empty.
+	chunk = [[sent.strip() for sent in line] for line in chunk if line[0].strip()]
+	# Workers do not run main, so the cache size is set here.
+	RESULT_CACHE.size = args.result_cache
+	# The typed edits of each different (orig, cor) pair in the chunk, or None if they must be computed.
+	results = {}
+	# The pairs of each line that are computed, rather than reused.
+	todo = []
+	# Collect the orig sents and the cor sents that are not in the cache and differ from them.
+	spacy_sents = []
+	cor_count = 0
+	for line in chunk:
+		keys = [resultKey(line[0], cor_sent, args) for cor_sent in line[1:] if cor_sent != line[0]]
+		todo.append([])
+		for key in keys:
+			# Only the first of several identical pairs in the chunk is computed.
+			if key in results:
+				toolbox.addStat("result_hits")
+			else:
+				results[key] = RESULT_CACHE.get(key)
+				if results[key] is None: todo[-1].append(key)
+		# The orig sent is only needed if one of its pairs is computed.
+		if todo[-1]:
+			spacy_sents.append(line[0].split())
+			spacy_sents.extend([list(key[1]) for key in todo[-1]])
+			cor_count += len(todo[-1])
+	# Markup all the sentences in the chunk with spacy at once (assume tokenized)
+	markup_start = time.perf_counter()
+	cache = spacy_cache.getCache(args.cache_dir, args.cache_size, nlp)
+	proc_sents = iter(toolbox.applySpacyBatch(spacy_sents, nlp, args.batch_size, cache, not args.lazy_parse))
+	# The time taken to compute each pair, for the estimate of the time saved by duplicates; see resultSummary.
+	# A duplicate pair saves the markup of its cor sent, but maybe not its orig sent, so only the cor sents are counted.
+	if spacy_sents:
+		toolbox.addStat("result_seconds", (time.perf_counter()-markup_start)*cor_count/len(spacy_sents))
+	if profiler.ENABLED: profiler.addTime("spacy", markup_start)
+	# Process each line of all input files.
+	for line, line_todo in zip(chunk, todo):
+		orig_sent = line[0]
+		cor_sents = line[1:]
+		# Write the original sentence to the output m2 file.
+		out_m2.append("S "+orig_sent+"\n")
+		# Get the marked up original sentence.
+		if line_todo: proc_orig = next(proc_sents)
+		# Loop through the corrected sentences
+		for cor_id, cor_sent in enumerate(cor_sents):
+			# Identical sentences have no edits, so just write noop.
+			if orig_sent == cor_sent:
+				out_m2.append("A -1 -1|||noop|||-NONE-|||REQUIRED|||-NONE-|||"+str(cor_id)+"\n")
+				continue
+			key = resultKey(orig_sent, cor_sent, args)
+			# Otherwise, do extra processing.
+			if key in line_todo:
+				line_todo.remove(key)
+				# Get the marked up corrected sentence.
+				proc_cor = next(proc_sents)
+				pair_start = time.perf_counter()
+				# Auto align the parallel sentences and extract the edits.
+				auto_edits = align_text.getAutoAlignedEdits(proc_orig, proc_cor, nlp, args)
+				if profiler.ENABLED: stage_start = time.perf_counter()
+				# Give each edit an automatic error type.
+				for auto_edit in auto_edits:
+					auto_edit[2] = cat_rules.autoTypeEdit(auto_edit, proc_orig, proc_cor, gb_spell, tag_map, nlp, stemmer)
+				toolbox.addStat("result_seconds", time.perf_counter()-pair_start)
+				# Log the time taken to align and classify the pair.
+				if profiler.ENABLED:
+					profiler.addSlow(profiler.addTime("auto_type", stage_start)-pair_start, orig_sent, cor_sent)
+				results[key] = tuple([tuple(auto_edit) for auto_edit in auto_edits])
+				RESULT_CACHE.put(key, results[key])
+			# Write the edits to the output m2 file.
+			for auto_edit in results[key]:
+				out_m2.append(toolbox.formatEdit(auto_edit, cor_id)+"\n")
+		# Write a newline when we have processed all corrections for a given sentence.
+		out_m2.append("\n")
+	return "".join(out_m2)
+
+# Input 1: An original sentence string.
+# Input 2: A corrected sentence string.
+# Input 3: Command line args.
+# Output: The RESULT_CACHE key of the sentence pair; the tokens and the args that change the edits.
+def resultKey(orig_sent, cor_sent, args):
+	return tuple(orig_sent.split()), tuple(cor_sent.split()), args.lev, args.merge, args.max_transposition
+
+# Output: A summary of how many sentence pairs were duplicates and an estimate of the time saved, or None.
+# The time saved is the number of duplicates times the mean time taken to markup, align and classify
+# the other pairs. Reading the input and writing the output are not counted.
+def resultSummary():
+	hits = toolbox.STATS["result_hits"]
+	misses = toolbox.STATS["result_misses"]
+	if not hits+misses: return None
+	saved = hits*toolbox.STATS["result_seconds"]/misses if misses else 0
+	return "Duplicate sentence pairs: {} of {} ({:.2f}%), an estimated {:.1f}s saved".format(hits, hits+misses, 100*hits/(hits+misses), saved)
 
 if __name__ == "__main__":
 	# Define and parse program input
@@ -74,6 +188,24 @@ if __name__ == "__main__":
 							"all-split: Merge nothing; e.g. MSSDI -> M, S, S, D, I\n"
 							"all-merge: Merge adjacent non-matches; e.g. MSSDI -> M, SSDI\n"
 							"all-equal: Merge adjacent same-type non-matches; e.g. MSSDI -> M, SS, D, I")
+	parser.add_argument("-batch_size", help="The number of sentences to markup with spacy at once. (default: 100)", default=100, type=int)
+	parser.add_argument("-workers", help="The number of worker processes. (default: 1)", default=1, type=int)
+	parser.add_argument("-band", help="Only fill in the alignment table within a band of this many cells around the\n"
+							"diagonal. The band is widened whenever an alignment outside it could be as good,\n"
+							"so the output is unchanged. Without a value, the width is based on the sentence lengths.",
+							nargs="?", const=0, type=int)
+	parser.add_argument("-cache_dir", help="A directory to keep spacy annotated sentences in and reuse them from.")
+	parser.add_argument("-cache_size", help="The maximum size of the cache directory in MB. (default: {})".format(spacy_cache.CACHE_SIZE),
+							default=spacy_cache.CACHE_SIZE, type=int)
+	parser.add_argument("-max_transposition", help="The maximum number of tokens in a transposition. (default: no maximum)", type=int)
+	parser.add_argument("-result_cache", help="The maximum number of sentence pairs whose edits are kept and reused for\n"
+							"duplicate pairs. (default: 100000)", default=100000, type=int)
+	parser.add_argument("-lazy_parse", help="Only POS tag sentences up front, and parse a sentence the first time\n"
+							"its dependency labels are needed to classify an edit.", action="store_true")
+	parser.add_argument("-profile", help="Time each stage of processing, show progress as it runs and save the timings,\n"
+							"the slowest sentence pairs and other counts to a JSON file. (default: OUT.profile.json)",
+							nargs="?", const="", metavar="JSON")
+	parser.add_argument("-slow_log", help="The number of slowest sentence pairs in the profile. (default: 10)", default=10, type=int)
 	args = parser.parse_args()
 	# Run the program.
 	main(args)
\ No newline at end of file
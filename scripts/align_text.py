@@ -1,11 +1,20 @@
 from itertools import groupby
 import spacy.parts_of_speech as POS
+import scripts.profiler as profiler
 import scripts.rdlextra as DL
+import scripts.toolbox as toolbox
+import scripts.word_types as word_types
 import string
+import time
 
 # Some global variables
-NLP = None
 CONTENT_POS = [POS.ADJ, POS.ADV, POS.NOUN, POS.VERB]
+# The maximum number of token pairs whose substitution cost is remembered.
+SUBSTITUTION_CACHE_SIZE = 200000
+# Substitution costs of (orig text, orig pos, cor text, cor pos) pairs across sentences.
+SUBSTITUTION_CACHE = toolbox.LRUCache("substitution", SUBSTITUTION_CACHE_SIZE)
+# Character costs of pairs of strings across sentences.
+CHAR_CACHE = toolbox.LRUCache("char", SUBSTITUTION_CACHE_SIZE)
 
 ### FUNCTIONS ###
 
@@ -85,15 +94,37 @@ def check_split(source, target, edits):
 # Input 3: The alignmen between the 2; [e.g. M, M, S ,S M]
 # Function that decide whether to merge, or keep separate, adjacent edits of various types
 # Processes 1 alignment at a time
+# Groups of edits are split into smaller groups until they are finished; see merge_group.
+# The groups are kept on a stack rather than processed recursively.
 def get_edits(source, target, edits):
-	if len(edits) < 1:
-		return edits
-	elif edits[0][0] == "M":
+	new_edits = []
+	# Groups (start, end) still to process and lists of finished edits; last first.
+	pending = [(0, len(edits))]
+	while pending:
+		group = pending.pop()
+		if isinstance(group, list):
+			new_edits.extend(group)
+		else:
+			pending.extend(reversed(merge_group(source, target, edits, group[0], group[1])))
+	return new_edits
+
+# Input 1: Spacy source sentence
+# Input 2: Spacy target sentence
+# Input 3: The alignmen between the 2; [e.g. M, M, S ,S M]
+# Input 4: The index of the first edit in the group.
+# Input 5: The index after the last edit in the group.
+# Output: A list of groups (start, end) that must be processed further, and lists 
+# of finished edits, in the order they appear in the alignment.
+# Applies the merging rules to the edits[start:end] group.
+def merge_group(source, target, edits, start, end):
+	if end - start < 1:
+		return []
+	elif edits[start][0] == "M":
 #		print("RULE 1")
-		return get_edits(source, target, edits[1:])
-	elif edits[-1][0] == "M":
+		return [(start+1, end)]
+	elif edits[end-1][0] == "M":
 #		print("RULE 1")
-		return get_edits(source, target, edits[:-1])
+		return [(start, end-1)]
 	else:
 		VP = [POS.VERB, POS.PART]
 		merge = False
@@ -101,19 +132,18 @@ def get_edits(source, target, edits):
 		old_op = None
 		old_pos_s = set()
 		old_pos_t = set()
-		i = -1 # Edit index in group
-		for e in edits:
-			i += 1
+		for i in range(start, end):
+			e = edits[i]
 			op = e[0]
 			if op == "M": # M in the middle => split
 #				print("RULE 1")
-				return get_edits(source, target, edits[:i]) + get_edits(source, target, edits[i+1:])
+				return [(start, i), (i+1, end)]
 			# Get the affected tokens
 			s = source[e[1]:e[2]][0] if len(source[e[1]:e[2]]) >= 1 else None
 			t = target[e[3]:e[4]][0] if len(target[e[3]:e[4]]) >= 1 else None
 			# Get the next affected tokens
 			j = i+1
-			if len(edits) > j:
+			if end > j:
 				s_ = source[edits[j][1]:edits[j][2]][0] if len(source[edits[j][1]:edits[j][2]]) >= 1 else None
 				t_ = target[edits[j][3]:edits[j][4]][0] if len(target[edits[j][3]:edits[j][4]]) >= 1 else None
 			else:
@@ -126,29 +156,29 @@ def get_edits(source, target, edits):
 			if ((s and (ispunct(s) or s.orth_[0].isupper())) or (t and (ispunct(t) or t.orth_[0].isupper()))) and \
 			   s_ and t_ and s_.lower_ == t_.lower_ and s_.orth_[0] != t_.orth_[0]: 
 #				print("RULE 2")
-				return get_edits(source, target, edits[:i]) + merge_edits(edits[i:j+1]) + get_edits(source, target, edits[j+1:])
+				return [(start, i), merge_edits(edits[i:j+1]), (j+1, end)]
 			# Keep all T separate.
 			elif op.startswith("T"):
 #				print("RULE 3")
-				return get_edits(source, target, edits[:i]) + [e] + get_edits(source, target, edits[i+1:])
+				return [(start, i), [e], (i+1, end)]
 			# Merge some possessives.
 			elif ((s and s.tag_ == "POS") or (t and t.tag_ == "POS")):
 #				print("RULE 4")
-				return merge_edits(edits[:i+1]) + get_edits(source, target, edits[i+1:])
+				return [merge_edits(edits[start:i+1]), (i+1, end)]
 			# Merge things like sub way -> subway. Some more possessives.
 			elif (s_ or t_) and check_split(source, target, edits[i:j+1]):
 #				print("RULE 5")
-				return get_edits(source, target, edits[:i]) + merge_edits(edits[i:j+1]) + get_edits(source, target, edits[j+1:])
+				return [(start, i), merge_edits(edits[i:j+1]), (j+1, end)]
 			# Adjacent subsittution rules.
 			elif op == "S":
 				# If tokens are very similar => split (spelling errors)			
-				if char_cost(s.orth_, t.orth_) < 0.3 and not (equal_pos and i > 0):
+				if char_cost(s.orth_, t.orth_) < 0.3 and not (equal_pos and i > start):
 #					print("RULE 6")
-					return get_edits(source, target, edits[:i]) + [e] + get_edits(source, target, edits[i+1:])
+					return [(start, i), [e], (i+1, end)]
 				# Consecutive substitutions are split.
 				elif old_op == "S": 
 #					print("RULE 7")
-					return get_edits(source, target, edits[:i]) + [e] + get_edits(source, target, edits[i+1:])
+					return [(start, i), [e], (i+1, end)]
 				# Merge if at least one content word		
 				else:
 #					print("RULE 8")
@@ -174,11 +204,11 @@ def get_edits(source, target, edits):
 		if (op == "D" and s.pos == POS.DET) or (op == "I" and t.pos == POS.DET) or \
 		   (op == "S" and (s.pos == POS.DET or t.pos == POS.DET)):
 #			print("RULE 10")
-			return merge_edits(edits[:i]) + [e]
+			return [merge_edits(edits[start:i]) + [e]]
 		elif merge:
-			return merge_edits(edits)
+			return [merge_edits(edits[start:end])]
 		else:
-			return edits
+			return [edits[start:end]]
 
 # all-split: No edits are ever merged. Everything is 1:1, 1:0 or 0:1 only.
 def get_edits_split(edits):
@@ -207,18 +237,14 @@ def get_edits_group_all(edits):
 
 # Get all possible lemmas for current token. By checking all POS, we increase
 # the chance that there will be a match.
-def get_lemmas(token):
-	return set([
-	NLP.vocab.morphology.lemmatize(POS.ADJ, token.orth, NLP.vocab.morphology.tag_map),
-	NLP.vocab.morphology.lemmatize(POS.ADV, token.orth, NLP.vocab.morphology.tag_map),
-	NLP.vocab.morphology.lemmatize(POS.NOUN, token.orth, NLP.vocab.morphology.tag_map),
-	NLP.vocab.morphology.lemmatize(POS.VERB, token.orth, NLP.vocab.morphology.tag_map)])
+def get_lemmas(token, nlp):
+	return word_types.getWordType(token.orth_).lemmas(nlp)
 
-def lemma_cost(A, B):
+def lemma_cost(A, B, nlp):
 	# Use 0.499 instead of 0.5 to prefer alignments having substitutions
 	# instead of unintuitive transpositions. This also avoids having an
 	# upperbound of 2 for substitutions, which is good. Now S is in [0, 5)
-	return 0.499 * get_lemmas(A).isdisjoint(get_lemmas(B))
+	return 0.499 * get_lemmas(A, nlp).isdisjoint(get_lemmas(B, nlp))
 
 # Is the token a content word?
 def is_content(A):
@@ -239,18 +265,28 @@ def pos_cost(A, B):
 		return 0.5
 
 # Calculate the cost of character alignment; i.e. char similarity
+# This is the cost of the first depth-first alignment divided by its length.
 def char_cost(A, B):
-	alignments = DL.WagnerFischer(A, B)
-	alignment = next(alignments.alignments(True))	# True uses Depth-first search.
-	return alignments.cost / float(len(alignment)) 
+	cost = CHAR_CACHE.get((A, B))
+	if cost is None:
+		distance, length = DL.char_distance(A, B)
+		cost = distance / float(length)
+		CHAR_CACHE.put((A, B), cost)
+	return cost
 
 # If there is a substitution, calculate the more informative cost.
-def token_substitution(A, B, A_extra, B_extra):
+def token_substitution(A, B, A_extra, B_extra, nlp):
 	# If lower case strings are the same, don't bother checking pos etc.
 	# This helps catch case marking substitution errors.
 	if A.lower() == B.lower():
 		return 0
-	cost = lemma_cost(A_extra, B_extra) + pos_cost(A_extra, B_extra) + char_cost(A, B)
+	# The cost only depends on the strings and pos of the tokens (and the spacy
+	# model), and most pairs (e.g. of function words) recur in many sentences, so look it up first.
+	key = (A, A_extra.pos, B, B_extra.pos, nlp)
+	cost = SUBSTITUTION_CACHE.get(key)
+	if cost is None:
+		cost = lemma_cost(A_extra, B_extra, nlp) + pos_cost(A_extra, B_extra) + char_cost(A, B)
+		SUBSTITUTION_CACHE.put(key, cost)
 	return cost
 
 # Change cost of Transpositions to be the same as Levenshtein.
@@ -268,18 +304,23 @@ def levSubstitution(a,b,c,d):
 # Output: A list of lists. Each sublist is an edit of the form:
 # edit = [orig_start, orig_end, cat, cor, cor_start, cor_end]
 def getAutoAlignedEdits(orig, cor, spacy, args):
-	# Save the spacy object globally.
-	global NLP
-	NLP = spacy
+	if profiler.ENABLED: start = time.perf_counter()
 	# Get a list of strings from the spacy objects.
 	orig_toks = [tok.text for tok in orig]
 	cor_toks = [tok.text for tok in cor]
 	# Align using Levenshtein.
-	if args.lev: alignments = DL.WagnerFischer(orig_toks, cor_toks, orig, cor, substitution=levSubstitution, transposition=levTransposition)
+	if args.lev: alignments = DL.WagnerFischer(orig_toks, cor_toks, orig, cor, substitution=levSubstitution, transposition=levTransposition, band=args.band, max_transposition=args.max_transposition)
 	# Otherwise, use linguistically enhanced Damerau-Levenshtein
-	else: alignments = DL.WagnerFischer(orig_toks, cor_toks, orig, cor, substitution=token_substitution)
+	else: alignments = DL.WagnerFischer(orig_toks, cor_toks, orig, cor, substitution=lambda A, B, A_extra, B_extra:
+		token_substitution(A, B, A_extra, B_extra, spacy), band=args.band, max_transposition=args.max_transposition)
+	# Keep track of how often the band had to be widened.
+	if args.band is not None:
+		toolbox.addStat("band_alignments")
+		toolbox.addStat("band_widened", int(alignments.widenings > 0))
 	# Get the alignment with the highest score. There is usually only 1 best in DL due to custom costs.
-	alignment = next(alignments.alignments(True)) # True uses Depth-first search.
+	# This is the first alignment found by depth-first search, without searching for the others.
+	alignment = alignments.best_alignment()
+	if profiler.ENABLED: start = profiler.addTime("wagner_fischer", start)
 	# Convert the alignment into edits; choose merge strategy
 	if args.merge == "rules": edits = get_edits(orig, cor, get_opcodes(alignment))
 	elif args.merge == "all-split": edits = get_edits_split(get_opcodes(alignment))
@@ -294,4 +335,11 @@ def getAutoAlignedEdits(orig, cor, spacy, args):
 		cor_end = edit[4]
 		cor_str = " ".join(cor_toks[cor_start:cor_end])
 		proc_edits.append([orig_start, orig_end, cat, cor_str, cor_start, cor_end])
+	if profiler.ENABLED: profiler.addTime("get_edits", start)
 	return proc_edits
+
+# Output: A summary of how often the alignment band had to be widened.
+def bandSummary():
+	total = toolbox.STATS["band_alignments"]
+	widened = toolbox.STATS["band_widened"]
+	return "Banded alignments: {}, widened: {} ({:.2f}%)".format(total, widened, 100*widened/total if total else 0)
@@ -0,0 +1,84 @@
+import os
+import threading
+from argparse import Namespace
+from collections import namedtuple
+import scripts.align_text as align_text
+import scripts.cat_rules as cat_rules
+import scripts.resources as resources
+import scripts.toolbox as toolbox
+
+# An automatically extracted and classified edit.
+# Spans are token offsets [start, end) and strings are the tokens in the span joined by spaces.
+Edit = namedtuple("Edit", ["o_start", "o_end", "o_str", "c_start", "c_end", "c_str", "type"])
+
+# Extract and classify the edits between original and corrected sentences in-process,
+# in the same way as parallel_to_m2.py.
+# An Annotator owns its resources and options and does not set any module globals,
+# so several Annotators can be used in the same process. An Annotator can be shared
+# by many threads, but each call holds its lock from spacy to the last classified edit,
+# since spacy models are not thread safe and lazy parsing calls spacy while classifying.
+# Concurrent calls are therefore serialised; use worker processes to annotate in parallel.
+# The word and alignment caches (toolbox.CACHES) and toolbox.STATS are shared by all the Annotators
+# in a process. The caches have their own locks, and STATS counts are added under toolbox.STATS_LOCK,
+# so several Annotators can be used at the same time without losing counts.
+# E.g.
+#	annotator = Annotator()
+#	annotator.annotate("This are a sentence .".split(), "This is a sentence .".split())
+#	[Edit(o_start=1, o_end=2, o_str='are', c_start=1, c_end=2, c_str='is', type='R:VERB:SVA')]
+class Annotator(object):
+
+	# Input 1: The base working directory of ERRANT. (default: the parent of this directory)
+	# Input 2: Use standard Levenshtein to align sentences.
+	# Input 3: The merging strategy; "rules", "all-split", "all-merge" or "all-equal".
+	# Input 4: The width of the alignment band, or 0 to base it on the sentence lengths. (default: no band)
+	# Input 5: The maximum number of tokens in a transposition. (default: no maximum)
+	# Input 6: The number of sentences spacy processes at a time in annotate_many.
+	# Input 7: Only POS tag sentences up front, and parse them when classification needs it.
+	def __init__(self, basename=None, lev=False, merge="rules", band=None, max_transposition=None, batch_size=100, lazy_parse=False):
+		if basename is None:
+			basename = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+		self.nlp, self.stemmer, self.gb_spell, self.tag_map = resources.loadResources(basename)
+		# The same options as the command line args of parallel_to_m2.py
+		self.options = Namespace(lev=lev, merge=merge, band=band, max_transposition=max_transposition)
+		self.batch_size = batch_size
+		self.lazy_parse = lazy_parse
+		self.lock = threading.Lock()
+
+	# Input 1: An original sentence; a list of token strings.
+	# Input 2: A corrected sentence; a list of token strings.
+	# Output: A list of Edits.
+	def annotate(self, orig, cor):
+		return self.annotate_many([(orig, cor)])[0]
+
+	# Input: A list of (original sentence, corrected sentence) pairs; each a list of token strings.
+	# Output: A list of lists of Edits; one for each pair.
+	# Sentences are marked up with spacy in batches, which is faster than annotating them one by one.
+	def annotate_many(self, pairs):
+		pairs = [(list(orig), list(cor)) for orig, cor in pairs]
+		# Collect the orig sents and any cor sents that differ from them.
+		spacy_sents = []
+		for orig, cor in pairs:
+			spacy_sents.append(orig)
+			if cor != orig: spacy_sents.append(cor)
+		with self.lock:
+			proc_sents = iter(toolbox.applySpacyBatch(spacy_sents, self.nlp, self.batch_size, parse=not self.lazy_parse))
+			all_edits = []
+			for orig, cor in pairs:
+				proc_orig = next(proc_sents)
+				# Identical sentences have no edits.
+				if cor == orig:
+					all_edits.append([])
+				else:
+					all_edits.append(self.extractEdits(proc_orig, next(proc_sents)))
+		return all_edits
+
+	# Input 1: A spacy annotated original sentence.
+	# Input 2: A spacy annotated corrected sentence.
+	# Output: A list of Edits.
+	def extractEdits(self, proc_orig, proc_cor):
+		edits = []
+		for auto_edit in align_text.getAutoAlignedEdits(proc_orig, proc_cor, self.nlp, self.options):
+			cat = cat_rules.autoTypeEdit(auto_edit, proc_orig, proc_cor, self.gb_spell, self.tag_map, self.nlp, self.stemmer)
+			o_str = " ".join([tok.text for tok in proc_orig[auto_edit[0]:auto_edit[1]]])
+			edits.append(Edit(auto_edit[0], auto_edit[1], o_str, auto_edit[4], auto_edit[5], auto_edit[3], cat))
+		return edits
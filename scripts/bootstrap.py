@@ -0,0 +1,89 @@
+import numpy as np
+
+# Input 1: A list of lists of (tp, fp, fn) tuples; one list for each sentence, one tuple for each ref coder.
+# Output 1: An int array of shape (sentences, coders, 3) of the counts. Missing coders are 0.
+# Output 2: A bool array of shape (sentences, coders); the coder exists in the sentence.
+def countArrays(sent_counts):
+	coders = max([len(counts) for counts in sent_counts]+[1])
+	counts = np.zeros((len(sent_counts), coders, 3), dtype=np.int64)
+	valid = np.zeros((len(sent_counts), coders), dtype=bool)
+	for sent_id, sent in enumerate(sent_counts):
+		counts[sent_id, :len(sent)] = sent
+		valid[sent_id, :len(sent)] = True
+	return counts, valid
+
+# Input 1-3: Arrays of true positives, false positives, false negatives
+# Input 4: Value of beta in F-score.
+# Output 1-3: Arrays of Precision, Recall and F-score rounded to 4dp.
+# The same as compare_m2.computeFScore for each element.
+def computeFScores(tp, fp, fn, beta):
+	tp = tp.astype(float)
+	with np.errstate(divide="ignore", invalid="ignore"):
+		p = np.where(fp > 0, tp/(tp+fp), 1.0)
+		r = np.where(fn > 0, tp/(tp+fn), 1.0)
+		f = np.where(p+r > 0, ((1+(beta**2))*p*r)/(((beta**2)*p)+r), 0.0)
+	return roundScores(p), roundScores(r), roundScores(f)
+
+# Input: An array of scores.
+# Output: The scores rounded to 4dp the same way as Python's round in compare_m2.computeFScore.
+# np.round scales by 10**4 first, so it can round half-way cases the other way; e.g. 0.00625 -> 0.0062.
+# Only the scores that are close to half-way are rounded with Python, which keeps it fast.
+def roundScores(scores):
+	rounded = np.round(scores, 4)
+	scaled = scores*10**4
+	close = np.abs(scaled-np.floor(scaled)-0.5) < 1e-6
+	if close.any():
+		rounded[close] = [round(float(score), 4) for score in scores[close]]
+	return rounded
+
+# Input 1: A list of (counts, valid) tuples from countArrays; one for each system.
+# Input 2: The number of resamples.
+# Input 3: Value of beta in F-score.
+# Input 4: A random seed.
+# Output: An int array of shape (systems, samples, 3); the global TP, FP and FN of each resample.
+# Each resample draws as many sentences as the test set with replacement, and the
+# best ref of each sentence is chosen in the order they are drawn, as in compare_m2.py.
+# All resamples are replayed at once, and all systems use the same resamples.
+def replay(systems, samples, beta, seed):
+	sents = systems[0][0].shape[0]
+	state = np.random.RandomState(seed)
+	totals = np.zeros((len(systems), samples, 3), dtype=np.int64)
+	rows = np.arange(samples)
+	for step in range(sents):
+		sent_ids = state.randint(0, sents, samples)
+		for sys_id, (counts, valid) in enumerate(systems):
+			sent_counts = counts[sent_ids]
+			choice = chooseCoders(sent_counts, valid[sent_ids], totals[sys_id], beta)
+			totals[sys_id] += sent_counts[rows, choice]
+	return totals
+
+# Input 1: An int array of shape (samples, coders, 3); the counts of each coder of a sentence.
+# Input 2: A bool array of shape (samples, coders); the coder exists in the sentence.
+# Input 3: An int array of shape (samples, 3); the global TP, FP and FN so far.
+# Input 4: Value of beta in F-score.
+# Output: An int array of the best coder of each sample.
+# The first coder with the highest F-score, then largest TP, lowest FP and lowest FN wins.
+def chooseCoders(counts, valid, totals, beta):
+	tp, fp, fn = counts[:, :, 0], counts[:, :, 1], counts[:, :, 2]
+	f = computeFScores(tp+totals[:, 0:1], fp+totals[:, 1:2], fn+totals[:, 2:3], beta)[2]
+	best = valid.copy()
+	for key in [f, tp, -fp, -fn]:
+		key = np.where(best, key, -np.inf)
+		best &= key == key.max(axis=1, keepdims=True)
+	return best.argmax(axis=1)
+
+# Input 1: An array of scores of each resample.
+# Input 2: The confidence level in percent.
+# Output: The lower and upper bounds of the confidence interval.
+def interval(scores, level):
+	return tuple(np.percentile(scores, [(100-level)/2, 100-(100-level)/2]))
+
+# Input 1: An array of the F-scores of system A in each resample.
+# Input 2: An array of the F-scores of system B in the same resamples.
+# Input 3: The F-score of A minus the F-score of B on the test set.
+# Output: The paired bootstrap p-value; how often the difference in a resample
+# does not have the same sign as on the test set.
+def pairedPValue(f_a, f_b, diff):
+	if diff > 0: return float(np.mean(f_a-f_b <= 0))
+	if diff < 0: return float(np.mean(f_a-f_b >= 0))
+	return 1.0
@@ -1,6 +1,8 @@
 from difflib import SequenceMatcher
 from string import punctuation
 import spacy.parts_of_speech as spos
+import scripts.toolbox as toolbox
+import scripts.word_types as word_types
 
 # Contractions
 conts = {"'d", "'ll", "'m", "n't", "'re", "'s", "'ve"}
@@ -40,11 +42,11 @@ def autoTypeEdit(edit, orig_sent, cor_sent, gb_spell, tag_map, nlp, stemmer):
 	# Missing
 	elif not orig_toks and cor_toks:
 		op = "M:"
-		cat = getOneSidedType(cor_toks, tag_map)
+		cat = getOneSidedType(cor_toks, tag_map, nlp)
 	# Unnecessary
 	elif orig_toks and not cor_toks:
 		op = "U:"
-		cat = getOneSidedType(orig_toks, tag_map)
+		cat = getOneSidedType(orig_toks, tag_map, nlp)
 	# Replacement and special cases
 	else:
 		# Same to same is a detected, but not corrected edit.
@@ -67,24 +69,31 @@ def autoTypeEdit(edit, orig_sent, cor_sent, gb_spell, tag_map, nlp, stemmer):
 
 # Input 1: Spacy tokens
 # Input 2: A map dict from PTB to universal dependency pos tags.
-# Output: A list of token, pos and dep tag strings.
+# Output: A list of token and pos tag strings.
 def getEditInfo(toks, tag_map):
 	str = []
 	pos = []
-	dep = []
 	for tok in toks:
 		str.append(tok.text)
 		pos.append(tag_map[tok.tag_])
-		dep.append(tok.dep_)
-	return str, pos, dep
+	return str, pos
+
+# Input 1: Spacy tokens
+# Input 2: A preloaded spacy processing object.
+# Output: A list of dep tag strings.
+# The sentence of the tokens is parsed first if it was only POS tagged.
+def getEditDeps(toks, nlp):
+	toolbox.parseIfNeeded(toks.doc, nlp)
+	return [tok.dep_ for tok in toks]
 
 # Input 1: Spacy tokens.
 # Input 2: A map dict from PTB to universal dependency pos tags.
+# Input 3: A preloaded spacy processing object.
 # Output: An error type string.
 # When one side of the edit is null, we can only use the other side.
-def getOneSidedType(toks, tag_map):
-	# Extract strings, pos tags and parse info from the toks.
-	str_list, pos_list, dep_list = getEditInfo(toks, tag_map)
+def getOneSidedType(toks, tag_map, nlp):
+	# Extract strings and pos tags from the toks.
+	str_list, pos_list = getEditInfo(toks, tag_map)
 	
 	# Special cases.
 	if len(toks) == 1:
@@ -95,8 +104,10 @@ def getOneSidedType(toks, tag_map):
 		if toks[0].lower_ in conts:
 			return "CONTR"			
 		# Infinitival "to" is treated as part of a verb form.
-		if toks[0].lower_ == "to" and toks[0].pos_ == "PART" and toks[0].dep_ != "prep":
+		if toks[0].lower_ == "to" and toks[0].pos_ == "PART" and getEditDeps(toks, nlp)[0] != "prep":
 			return "VERB:FORM"
+	# Parse info is needed from here on.
+	dep_list = getEditDeps(toks, nlp)
 	# Auxiliary verbs.
 	if set(dep_list).issubset({"aux", "auxpass"}):
 		return "VERB:TENSE"	
@@ -121,9 +132,10 @@ def getOneSidedType(toks, tag_map):
 # Input 6: The Lancaster stemmer in NLTK.
 # Output: An error type string.
 def getTwoSidedType(orig_toks, cor_toks, gb_spell, tag_map, nlp, stemmer):
-	# Extract strings, pos tags and parse info from the toks.
-	orig_str, orig_pos, orig_dep = getEditInfo(orig_toks, tag_map)
-	cor_str, cor_pos, cor_dep = getEditInfo(cor_toks, tag_map)
+	# Extract strings and pos tags from the toks.
+	# Parse info is only extracted when a rule needs it.
+	orig_str, orig_pos = getEditInfo(orig_toks, tag_map)
+	cor_str, cor_pos = getEditInfo(cor_toks, tag_map)
 
 	# Orthography; i.e. whitespace and/or case errors.
 	if onlyOrthChange(orig_str, cor_str):
@@ -154,10 +166,11 @@ def getTwoSidedType(orig_toks, cor_toks, gb_spell, tag_map, nlp, stemmer):
 		# 2. SPELLING AND INFLECTION
 		# Only check alphabetical strings on the original side.
 		# Spelling errors take precendece over POS errors so this rule is ordered.
-		if orig_str[0].isalpha():
+		orig_type = word_types.getWordType(orig_str[0])
+		if orig_type.isalpha:
 			# Check a GB English dict for both orig and lower case.
 			# "cat" is in the dict, but "Cat" is not.
-			if orig_str[0] not in gb_spell and orig_str[0].lower() not in gb_spell:
+			if not orig_type.inDict(gb_spell):
 				# Check if both sides have a common lemma
 				if sameLemma(orig_toks[0], cor_toks[0], nlp):
 					# Inflection; Usually count vs mass nouns or e.g. got vs getted
@@ -198,6 +211,9 @@ def getTwoSidedType(orig_toks, cor_toks, gb_spell, tag_map, nlp, stemmer):
 				if orig_pos[0] == "VERB":
 					# NOTE: These rules are carefully ordered.
 					# Use the dep parse to find some form errors.
+					# Parsing is only done here and below, so ADJ and NOUN edits never need it.
+					orig_dep = getEditDeps(orig_toks, nlp)
+					cor_dep = getEditDeps(cor_toks, nlp)
 					# Main verbs preceded by aux cannot be tense or SVA.
 					if precededByAux(orig_toks, cor_toks):
 						return "VERB:FORM"
@@ -215,6 +231,8 @@ def getTwoSidedType(orig_toks, cor_toks, gb_spell, tag_map, nlp, stemmer):
 					if orig_dep[0].startswith("aux") and cor_dep[0].startswith("aux"):
 						return "VERB:TENSE"
 			# Use dep labels to find some more ADJ:FORM
+			orig_dep = getEditDeps(orig_toks, nlp)
+			cor_dep = getEditDeps(cor_toks, nlp)
 			if set(orig_dep+cor_dep).issubset({"acomp", "amod"}):
 				return "ADJ:FORM"
 			# Adj to plural noun is usually a noun number error; e.g. musical -> musicals.
@@ -233,11 +251,13 @@ def getTwoSidedType(orig_toks, cor_toks, gb_spell, tag_map, nlp, stemmer):
 			else:
 				return "MORPH"
 		# Derivational morphology.
-		if stemmer.stem(orig_str[0]) == stemmer.stem(cor_str[0]) and \
+		if orig_type.stem(stemmer) == word_types.getWordType(cor_str[0]).stem(stemmer) and \
 			orig_pos[0] in open_tags and cor_pos[0] in open_tags:
 			return "MORPH"
 
 		# 4. GENERAL
+		orig_dep = getEditDeps(orig_toks, nlp)
+		cor_dep = getEditDeps(cor_toks, nlp)
 		# Auxiliaries with different lemmas
 		if orig_dep[0].startswith("aux") and cor_dep[0].startswith("aux"):
 			return "VERB:TENSE"
@@ -263,6 +283,8 @@ def getTwoSidedType(orig_toks, cor_toks, gb_spell, tag_map, nlp, stemmer):
 			return "OTHER"
 	
 	# Multi-token replacements (uncommon)
+	orig_dep = getEditDeps(orig_toks, nlp)
+	cor_dep = getEditDeps(cor_toks, nlp)
 	# All auxiliaries
 	if set(orig_dep+cor_dep).issubset({"aux", "auxpass"}):
 		return "VERB:TENSE"		
@@ -326,13 +348,10 @@ def exactReordering(orig_str, cor_str):
 # Spacy only finds lemma for its predicted POS tag. Sometimes these are wrong,
 # so we also consider alternative POS tags to improve chance of a match.
 def sameLemma(orig_tok, cor_tok, nlp):
-	orig_lemmas = []
-	cor_lemmas = []
-	for pos in open_pos:
-		# Pass the lower cased form of the word for lemmatization; improves accuracy.
-		orig_lemmas.append(nlp.vocab.morphology.lemmatize(pos, orig_tok.lower, nlp.vocab.morphology.tag_map))
-		cor_lemmas.append(nlp.vocab.morphology.lemmatize(pos, cor_tok.lower, nlp.vocab.morphology.tag_map))
-	if set(orig_lemmas).intersection(set(cor_lemmas)):
+	# Pass the lower cased form of the word for lemmatization; improves accuracy.
+	orig_lemmas = word_types.getWordType(orig_tok.lower_).lemmas(nlp)
+	cor_lemmas = word_types.getWordType(cor_tok.lower_).lemmas(nlp)
+	if orig_lemmas.intersection(cor_lemmas):
 		return True
 	return False
 
@@ -0,0 +1,47 @@
+# Strings numbered in the order they are first seen; interner[string] is the id of the string.
+# Each string is only kept once, however many edits use it.
+class Interner(dict):
+
+	def __init__(self):
+		dict.__init__(self)
+		self.strings = []
+
+	def __missing__(self, string):
+		i = self[string] = len(self.strings)
+		self.strings.append(string)
+		return i
+
+# The error categories and corrections of the edits seen in this process.
+# Ids are only meaningful in the process that made them, so edits are decoded
+# before they are saved or sent to another process.
+CATS = Interner()
+CORS = Interner()
+NOOP = CATS["noop"]
+UNK = CATS["UNK"]
+
+# Input: An edit dict key of ints; (start, end) for detection, (start, end, cor) or
+# (start, end, cat, cor) for correction. See compare_m2.buildEdits.
+# Output: The key with the category and correction strings instead of their ids.
+def decodeEdit(key):
+	if len(key) == 4: return (key[0], key[1], CATS.strings[key[2]], CORS.strings[key[3]])
+	if len(key) == 3: return (key[0], key[1], CORS.strings[key[2]])
+	return key
+
+# Input: An edit dict key of strings; see decodeEdit.
+# Output: The key with ids instead of strings.
+def encodeEdit(key):
+	if len(key) == 4: return (key[0], key[1], CATS[key[2]], CORS[key[3]])
+	if len(key) == 3: return (key[0], key[1], CORS[key[2]])
+	return key
+
+# Input: A dictionary where key is coder and value is edit dict of ints; see compare_m2.buildEdits.
+# Output: The same dictionary with strings instead of ids.
+def decodeEdits(coder_dict):
+	return {coder: {decodeEdit(key): [CATS.strings[cat] for cat in cats] for key, cats in edits.items()}
+		for coder, edits in coder_dict.items()}
+
+# Input: A decodeEdits dictionary.
+# Output: The same dictionary with ids instead of strings.
+def encodeEdits(coder_dict):
+	return {coder: {encodeEdit(key): [CATS[cat] for cat in cats] for key, cats in edits.items()}
+		for coder, edits in coder_dict.items()}
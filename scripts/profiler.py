@@ -0,0 +1,126 @@
+import heapq
+import json
+import time
+import scripts.toolbox as toolbox
+
+# Profiling is off unless a script is run with -profile; see enable.
+# When it is off, each timed stage costs one check of this flag.
+ENABLED = False
+# The stages timed by -profile, in the order they are run, and what they cover.
+STAGES = [("load", "Loading spacy and the other resources"),
+	("spacy", "Marking up sentences with spacy"),
+	("wagner_fischer", "Aligning sentences"),
+	("get_edits", "Merging the alignment into edits"),
+	("auto_type", "Classifying the edits"),
+	("write", "Writing the output")]
+# The number of slowest sentence pairs kept in the slow log.
+SLOW_SIZE = 10
+# The slow log of this process; a heap of (seconds, orig sent, cor sent) tuples.
+SLOW = []
+
+# Input: The number of slowest sentence pairs to keep.
+# Turn on profiling in this process.
+def enable(slow_size):
+	global ENABLED, SLOW_SIZE
+	ENABLED = True
+	SLOW_SIZE = slow_size
+
+# Input 1: The name of a stage in STAGES.
+# Input 2: The time.perf_counter() when the stage started.
+# Output: The time.perf_counter() now, so the next stage can start from it.
+# The time and number of calls of each stage are counted in toolbox.STATS, so
+# worker processes send them back with their results.
+def addTime(stage, start):
+	now = time.perf_counter()
+	toolbox.addStat("profile_"+stage+"_seconds", now-start)
+	toolbox.addStat("profile_"+stage+"_calls")
+	return now
+
+# Input 1: The time taken to align and classify a sentence pair.
+# Input 2: The original sentence string.
+# Input 3: The corrected sentence string.
+# Keep the pair if it is one of the SLOW_SIZE slowest so far.
+def addSlow(seconds, orig_sent, cor_sent):
+	entry = (seconds, orig_sent, cor_sent)
+	if len(SLOW) < SLOW_SIZE: heapq.heappush(SLOW, entry)
+	elif entry > SLOW[0]: heapq.heapreplace(SLOW, entry)
+
+# Output: The slow log of this process, which is then emptied.
+# Worker processes send it back with their results; see workers.py.
+def takeSlow():
+	slow = SLOW[:]
+	del SLOW[:]
+	return slow
+
+# Prints the number of sentences done, sentences per second and the time left as a run goes.
+class Progress(object):
+
+	# Input: The total number of sentences in the input.
+	def __init__(self, total):
+		self.total = total
+		self.start = time.perf_counter()
+		self.last = self.start
+
+	# Input: The number of sentences done so far.
+	# Prints at most once a second.
+	def update(self, done):
+		now = time.perf_counter()
+		if now-self.last < 1 and done < self.total: return
+		self.last = now
+		rate = done/(now-self.start) if now > self.start else 0
+		eta = (self.total-done)/rate if rate else 0
+		print("\r{}/{} sentences, {:.1f} sents/s, ETA {}".format(done, self.total, rate, formatSeconds(eta)), end="", flush=True)
+
+	# End the progress line.
+	def finish(self):
+		print("")
+
+# Input: A number of seconds.
+# Output: The seconds as h:mm:ss.
+def formatSeconds(seconds):
+	minutes, seconds = divmod(int(seconds), 60)
+	hours, minutes = divmod(minutes, 60)
+	return "{}:{:02d}:{:02d}".format(hours, minutes, seconds)
+
+# Input 1: The wall time of the whole run.
+# Input 2: The number of sentences processed.
+# Output: A dictionary of the profile of the run; the time and calls of each stage,
+# the slow log and the other toolbox.STATS counts, e.g. of the caches.
+# With worker processes, stage times are the total over all workers, so they can add up to more than the wall time.
+def report(seconds, sentences):
+	stages = {}
+	for stage, description in STAGES:
+		if "profile_"+stage+"_calls" not in toolbox.STATS: continue
+		stage_seconds = toolbox.STATS["profile_"+stage+"_seconds"]
+		stages[stage] = {"seconds": stage_seconds,
+			"calls": toolbox.STATS["profile_"+stage+"_calls"],
+			"percent": 100*stage_seconds/seconds if seconds else 0}
+	slowest = [{"seconds": slow_seconds, "orig_len": len(orig_sent.split()), "cor_len": len(cor_sent.split()),
+		"orig": orig_sent, "cor": cor_sent} for slow_seconds, orig_sent, cor_sent in sorted(SLOW, reverse=True)]
+	counts = {key: value for key, value in toolbox.STATS.items() if not key.startswith("profile_")}
+	return {"seconds": seconds,
+		"sentences": sentences,
+		"sents_per_sec": sentences/seconds if seconds else 0,
+		"stages": stages,
+		"slowest": slowest,
+		"stats": counts}
+
+# Input 1: A report dictionary.
+# Input 2: The path of the stats JSON file.
+# Print a summary of the report and save it to the path.
+def saveReport(profile, path):
+	print('{:=^66}'.format(" Profile "))
+	print("{} sentences in {:.2f}s ({:.1f} sents/s)".format(profile["sentences"], profile["seconds"], profile["sents_per_sec"]))
+	for stage, description in STAGES:
+		if stage not in profile["stages"]: continue
+		stage_profile = profile["stages"][stage]
+		print("{:<40}{:>10.2f}s {:>6.1f}% {:>9} calls".format(description, stage_profile["seconds"],
+			stage_profile["percent"], stage_profile["calls"]))
+	if profile["slowest"]:
+		print("Slowest sentence pairs (orig tokens, cor tokens):")
+		for slow in profile["slowest"]:
+			print("{:>10.4f}s {:>5} {:>5}".format(slow["seconds"], slow["orig_len"], slow["cor_len"]))
+	print('{:=^66}'.format(""))
+	with open(path, "w") as out:
+		json.dump(profile, out, indent=1)
+	print("Saved the profile to "+path)
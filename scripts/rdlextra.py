@@ -88,6 +88,8 @@ import collections
 import doctest
 import pprint
 
+import numpy
+
 
 # Default cost functions.
 
@@ -108,6 +110,58 @@ def TRANSPOSITION(A, B, A_extra=None, B_extra=None):
 
 Trace = collections.namedtuple("Trace", ["cost", "ops"])
 
+# Bitmask values of the operations stored in the backpointer table.
+OP_M = 1
+OP_D = 2
+OP_I = 4
+OP_S = 8
+OP_T = 16
+OP_O = 32
+# Tables with at most this many cells are filled one cell at a time.
+SMALL_TABLE = 900
+# Order in which the operations of a cell are stepped back through.
+OP_ORDER = ((OP_M, "M"), (OP_D, "D"), (OP_I, "I"), (OP_S, "S"), (OP_T, "T"))
+# The smallest band width used when it is derived from the sentence lengths.
+BAND_WIDTH = 8
+
+def find_transposition(Al, Bl, i, j, cost, max_length=None):
+    """
+    Given a non-matching cell (i + 1, j + 1), walks back along the diagonal
+    while the operations have a cost, and returns the smallest k for which
+    Al[i-k:i+1] and Bl[j-k:j+1] contain the same elements, or None.
+    cost(a, b) returns the partial cost of cell (a, b) of the table.
+    Transpositions of more than max_length elements are not considered.
+
+    The difference between the two multisets is updated as k grows, and
+    the walk stops as soon as the remaining steps cannot balance it.
+
+    >>> find_transposition("abc", "bca", 2, 2, lambda a, b: a + b)
+    2
+    >>> find_transposition("abc", "bca", 2, 2, lambda a, b: a + b, 2) is None
+    True
+    """
+    # Multiword transpositions:
+    # Find a sequence of equal elements in different order
+    # We only need to check diagonally because we require the same number of elements
+    if max_length is None:
+        max_length = min(i, j) + 2
+    # How many more elements of Al than of Bl there are of each type.
+    diff = {Al[i]: 1}
+    diff[Bl[j]] = diff.get(Bl[j], 0) - 1
+    unbalanced = sum(1 for x in diff.values() if x)
+    k = 1
+    while (i - k) >= 0 and (j - k) >= 0 and k < max_length and cost(i-k+1, j-k+1) - cost(i-k, j-k) > 0: # An operation that has a cost (i.e. I, D or S > 0)
+        for x, d in ((Al[i-k], 1), (Bl[j-k], -1)):
+            old = diff.get(x, 0)
+            diff[x] = old + d
+            unbalanced += (old == 0) - (old + d == 0)
+        if not unbalanced:
+            return k
+        # Each step adds two elements, which balance at most two types.
+        if unbalanced > 2 * (min(i, j, max_length - 1) - k):
+            return None
+        k += 1
+
 class WagnerFischer(object):
 
     """
@@ -119,19 +173,27 @@ class WagnerFischer(object):
     Basic tests:
 
     >>> WagnerFischer("god", "gawd").cost
-    2
+    2.0
     >>> WagnerFischer("sitting", "kitten").cost
-    3
+    3.0
     >>> WagnerFischer("bana", "banananana").cost
-    6
+    6.0
     >>> WagnerFischer("bana", "bana").cost
-    0
+    0.0
     >>> WagnerFischer("banana", "angioplastical").cost
-    11
+    11.0
     >>> WagnerFischer("angioplastical", "banana").cost
-    11
+    11.0
     >>> WagnerFischer("Saturday", "Sunday").cost
-    3
+    3.0
+
+    Banded tests (the band is widened until the result is exact):
+
+    >>> WagnerFischer("sitting", "kitten", band=1).cost
+    3.0
+    >>> wf = WagnerFischer("abcdefgh", "hgfedcba", band=1)
+    >>> wf.cost == WagnerFischer("abcdefgh", "hgfedcba").cost, wf.widenings
+    (True, 2)
 
     IDS tests:
 
@@ -167,107 +229,281 @@ class WagnerFischer(object):
     pprinter = pprint.PrettyPrinter(width=75)
 
     def __init__(self, A, B, A_extra=None, B_extra=None, insertion=INSERTION, deletion=DELETION,
-                 substitution=SUBSTITUTION, transposition=TRANSPOSITION):
+                 substitution=SUBSTITUTION, transposition=TRANSPOSITION, band=None,
+                 max_transposition=None):
         # Stores cost functions in a dictionary for programmatic access.
         self.costs = {"I": insertion, "D": deletion, "S": substitution, "T":transposition}
+        # The maximum number of elements in a transposition (None: no maximum).
+        self.max_transposition = max_transposition
+        # Interns tokens to integer ids, so matches are integer comparisons.
+        ids = {}
+        Aid = [ids.setdefault(x, len(ids)) for x in A]
+        Bid = [ids.setdefault(x, len(ids)) for x in B]
         # Keep lowercased versions for transpositions
-        Al = [x.lower() for x in A]
-        Bl = [x.lower() for x in B]
+        lids = {}
+        Al = [lids.setdefault(x.lower(), len(lids)) for x in A]
+        Bl = [lids.setdefault(x.lower(), len(lids)) for x in B]
         # Initializes table.
         self.asz = len(A)
         self.bsz = len(B)
-        self._table = [[None for _ in range(self.bsz + 1)] for
-                       _ in range(self.asz + 1)]
-        # From now on, all indexing done using self.__getitem__.
+        # Gets the cost of deleting each token in A and inserting each token in B.
+        dcosts = [self.costs["D"](A[i], A_extra[i] if A_extra else None) for i in range(self.asz)]
+        icosts = [self.costs["I"](B[j], B_extra[j] if B_extra else None) for j in range(self.bsz)]
+        # Gets the cost of substituting each pair of non-matching tokens.
+        # Costs are only computed for the cells that are filled in.
+        if substitution is SUBSTITUTION:
+            scosts = [[1] * self.bsz for _ in range(self.asz)]
+        else:
+            scosts = [[None] * self.bsz for _ in range(self.asz)]
+        def scost(i, j):
+            if scosts[i][j] is None:
+                scosts[i][j] = float("inf") if Aid[i] == Bid[j] else \
+                    self.costs["S"](A[i], B[j], A_extra[i] if A_extra else None, B_extra[j] if B_extra else None)
+            return scosts[i][j]
+        # Gets the cost of transposing A[i-k:i+1] and B[j-k:j+1].
+        def tcost(i, j, k):
+            return self.costs["T"](A[i-k:i+1], B[j-k:j+1], A_extra[i-k:i+1] if A_extra else None, B_extra[j-k:j+1] if B_extra else None)
+        # The table is stored as an array of partial costs, an array of
+        # backpointer bitmasks (OP_*) and the number of elements in any
+        # transposition. Small tables are cheaper to fill one cell at a time.
+        if self.asz * self.bsz <= SMALL_TABLE:
+            fill = self._fill_cells
+        else:
+            fill = self._fill_diagonals
+        # A band only fills in the cells (i, j) where j - i is at most
+        # `width` outside the range between 0 and len(B) - len(A). A width
+        # of 0 is derived from the sentence lengths.
+        self.band = band
+        self.widenings = 0
+        if band == 0:
+            self.band = max(BAND_WIDTH, abs(self.bsz - self.asz))
+        while True:
+            lo, hi = self._band_limits()
+            self._costs, self._ops, self._tlen = fill(Aid, Bid, Al, Bl, dcosts, icosts, scost, tcost, lo, hi)
+            # Stores optimum cost as a property.
+            self.cost = self._costs[-1, -1].item()
+            if self._band_is_exact(dcosts + icosts, lo, hi):
+                break
+            # An alignment outside the band may be as cheap, so try again
+            # with a band twice as wide.
+            self.band *= 2
+            self.widenings += 1
+
+    def _band_limits(self):
+        """
+        Returns the lowest and highest j - i of the cells (i, j) in the band.
+        """
+        if self.band is None:
+            return -self.asz, self.bsz
+        return (max(-self.asz, min(0, self.bsz - self.asz) - self.band),
+                min(self.bsz, max(0, self.bsz - self.asz) + self.band))
+
+    def _band_is_exact(self, indel_costs, lo, hi):
+        """
+        Checks that no alignment leaving the band lo <= j - i <= hi can
+        cost as much as the optimum found in it. Substitutions and
+        transpositions keep j - i the same, so an alignment through a cell
+        with j - i == d needs at least |d| + |len(B) - len(A) - d|
+        insertions and deletions.
+        """
+        outside = [d for d in (lo - 1, hi + 1) if -self.asz <= d <= self.bsz]
+        if not outside:
+            return True
+        min_indel = min(indel_costs)
+        diff = self.bsz - self.asz
+        return all(min_indel * (abs(d) + abs(diff - d)) > self.cost for d in outside)
+
+    def _transposition(self, Al, Bl, i, j, cost, tcost):
+        """
+        Given a non-matching cell (i + 1, j + 1), find the shortest
+        transposition of A[i-k:i+1] and B[j-k:j+1]; see find_transposition.
+        Returns the cost and the number of elements of the transposition,
+        or None.
+        """
+        k = find_transposition(Al, Bl, i, j, cost, self.max_transposition)
+        if k is not None:
+            return cost(i-k, j-k) + tcost(i, j, k), k + 1
+
+    def _fill_cells(self, Aid, Bid, Al, Bl, dcosts, icosts, scost, tcost, lo, hi):
+        """
+        Fills in the cells (i, j) with lo <= j - i <= hi one at a time.
+        """
+        costs = [[float("inf")] * (self.bsz + 1) for _ in range(self.asz + 1)]
+        ops = [[0] * (self.bsz + 1) for _ in range(self.asz + 1)]
+        tlen = [[0] * (self.bsz + 1) for _ in range(self.asz + 1)]
+        cost = lambda a, b: costs[a][b]
+        # A transposition ending at (i, j) needs A[i] somewhere in B[:j+1] and
+        # B[j] somewhere in A[:i+1]; only these cells need to be checked.
+        first_in_B = [Bl.index(x) if x in Bl else self.bsz for x in Al]
+        first_in_A = [Al.index(x) if x in Al else self.asz for x in Bl]
         ## Fills in edges.
-        self[0][0] = Trace(0, {"O"})  # Start cell.
-        for i in range(1, self.asz + 1):
-            self[i][0] = Trace(self[i - 1][0].cost + self.costs["D"](A[i - 1], A_extra[i - 1] if A_extra else None),
-                               {"D"})
-        for j in range(1, self.bsz + 1):
-            self[0][j] = Trace(self[0][j - 1].cost + self.costs["I"](B[j - 1], B_extra[j - 1] if B_extra else None),
-                               {"I"})
-        
+        costs[0][0] = 0
+        ops[0][0] = OP_O  # Start cell.
+        for i in range(1, min(self.asz, -lo) + 1):
+            costs[i][0] = costs[i - 1][0] + dcosts[i - 1]
+            ops[i][0] = OP_D
+        for j in range(1, min(self.bsz, hi) + 1):
+            costs[0][j] = costs[0][j - 1] + icosts[j - 1]
+            ops[0][j] = OP_I
+
         ## Fills in rest.
-        for i in range(len(A)):
-            for j in range(len(B)):                
+        for i in range(self.asz):
+            for j in range(max(0, i + lo), min(self.bsz, i + hi + 1)):
                 # Cleans it up in case there are more than one check for match
                 # first, as it is always the cheapest option.
-                if A[i] == B[j]:
-                    self[i + 1][j + 1] = Trace(self[i][j].cost, {"M"})
+                if Aid[i] == Bid[j]:
+                    costs[i + 1][j + 1] = costs[i][j]
+                    ops[i + 1][j + 1] = OP_M
                 # Checks for other types.
                 else:
-                    costD = self[i][j + 1].cost + self.costs["D"](A[i], A_extra[i] if A_extra else None)
-                    costI = self[i + 1][j].cost + self.costs["I"](B[j], B_extra[j] if B_extra else None)
-                    costS = self[i][j].cost + self.costs["S"](A[i], B[j], A_extra[i] if A_extra else None, B_extra[j] if B_extra else None)
-                    costT = float("inf") # We don't know it yet
+                    costD = costs[i][j + 1] + dcosts[i]
+                    costI = costs[i + 1][j] + icosts[j]
+                    costS = costs[i][j] + scost(i, j)
                     min_val = min(costI, costD, costS)
-
-                    # Multiword transpositions:
-                    # Find a sequence of equal elements in different order
-                    # We only need to check diagonally because we require the same number of elements
-                    k = 1
-                    #while i > 0 and j > 0 and (i - k) >= 0 and (j - k) >= 0 and any(x in ["D", "I", "S"] for x in self[i-k+1][j-k+1].ops):
-                    while i > 0 and j > 0 and (i - k) >= 0 and (j - k) >= 0 and self[i-k+1][j-k+1].cost - self[i-k][j-k].cost > 0: # An operation that has a cost (i.e. I, D or S > 0)
-                        if collections.Counter(Al[i-k:i+1]) == collections.Counter(Bl[j-k:j+1]):
-                            costT = self[i-k][j-k].cost + self.costs["T"](A[i-k:i+1], B[j-k:j+1], A_extra[i-k:i+1] if A_extra else None, B_extra[j-k:j+1] if B_extra else None)
-                            min_val = min(min_val, costT)
-                            break
-                        k += 1
-                    
-                    trace = Trace(min_val, []) # Use a list to preserve the order
+                    trans = None
+                    if first_in_B[i] <= j and first_in_A[j] <= i:
+                        trans = self._transposition(Al, Bl, i, j, cost, tcost)
+                    if trans and trans[0] <= min_val:
+                        min_val = trans[0]
+                        ops[i + 1][j + 1] = OP_T
+                        tlen[i + 1][j + 1] = trans[1]
                     # Adds _all_ operations matching minimum value.
-                    if costD == min_val:
-                        trace.ops.append("D")
-                    if costI == min_val:
-                        trace.ops.append("I")
-                    if costS == min_val:
-                        trace.ops.append("S")
-                    if costT == min_val:
-                        trace.ops.append("T" + str(k+1))
-                    self[i + 1][j + 1] = trace
-                                        
-        # Stores optimum cost as a property.
-        self.cost = self[-1][-1].cost
+                    ops[i + 1][j + 1] |= (costD == min_val) * OP_D | \
+                        (costI == min_val) * OP_I | (costS == min_val) * OP_S
+                    costs[i + 1][j + 1] = min_val
+        return (numpy.array(costs, dtype=float), numpy.array(ops, dtype=numpy.uint8),
+                numpy.array(tlen, dtype=numpy.intp))
+
+    def _fill_diagonals(self, Aid, Bid, Al, Bl, dcosts, icosts, scost, tcost, lo, hi):
+        """
+        Fills in the cells (i, j) with lo <= j - i <= hi one anti-diagonal
+        at a time, without a Python object per cell. Every cell only
+        depends on cells of earlier anti-diagonals, so the cells of an
+        anti-diagonal are independent.
+        """
+        n = self.asz
+        m = self.bsz
+        band = numpy.arange(m)[None, :] - numpy.arange(n)[:, None]
+        band = (band >= lo) & (band <= hi)
+        scosts = numpy.full((n, m), float("inf"))
+        for i, j in zip(*numpy.nonzero(band)):
+            scosts[i, j] = scost(i.item(), j.item())
+        dcosts = numpy.array(dcosts, dtype=float)
+        icosts = numpy.array(icosts, dtype=float)
+        match = numpy.array(Aid)[:, None] == numpy.array(Bid)[None, :]
+        # A transposition ending at (i, j) needs A[i] somewhere in B[:j+1] and
+        # B[j] somewhere in A[:i+1]; only these cells need to be checked.
+        leq = numpy.array(Al)[:, None] == numpy.array(Bl)[None, :]
+        first_in_B = numpy.where(leq.any(axis=1), leq.argmax(axis=1), m)
+        first_in_A = numpy.where(leq.any(axis=0), leq.argmax(axis=0), n)
+        tcand = (first_in_B[:, None] <= numpy.arange(m)[None, :]) & \
+                (first_in_A[None, :] <= numpy.arange(n)[:, None]) & ~match & band
+        # While filling, cell (i, j) is stored at [i + j, i] so that each
+        # anti-diagonal is a slice.
+        costs = numpy.full((n + m + 1, n + 1), float("inf"))
+        ops = numpy.zeros((n + m + 1, n + 1), dtype=numpy.uint8)
+        tlen = numpy.zeros((n + m + 1, n + 1), dtype=numpy.intp)
+        cost = lambda a, b: costs.item(a + b, a)
+        # Substitution costs, matches and transposition candidates of the
+        # tokens ending at cell (i + 1, j + 1), in the same layout.
+        I = numpy.arange(n)[:, None]
+        J = numpy.arange(m)[None, :]
+        skew_scosts = numpy.zeros((n + m + 1, n + 1))
+        skew_scosts[I + J + 2, I + 1] = scosts
+        skew_match = numpy.zeros((n + m + 1, n + 1), dtype=bool)
+        skew_match[I + J + 2, I + 1] = match
+        skew_tcand = numpy.zeros((n + m + 1, n + 1), dtype=bool)
+        skew_tcand[I + J + 2, I + 1] = tcand
+        ## Fills in edges.
+        costs[0, 0] = 0
+        ops[0, 0] = OP_O  # Start cell.
+        for i in range(1, min(n, -lo) + 1):
+            costs[i, i] = costs[i - 1, i - 1] + dcosts[i - 1]
+            ops[i, i] = OP_D
+        for j in range(1, min(m, hi) + 1):
+            costs[j, 0] = costs[j - 1, 0] + icosts[j - 1]
+            ops[j, 0] = OP_I
+        band_lo, band_hi = lo, hi
+
+        ## Fills in rest.
+        for d in range(2, n + m + 1):
+            # Cells (i, d - i) for lo <= i <= hi inside the band.
+            lo = max(1, d - m, (d - band_hi + 1) // 2)
+            hi = min(n, d - 1, (d - band_lo) // 2)
+            if lo > hi:
+                continue
+            costD = costs[d - 1, lo - 1:hi] + dcosts[lo - 1:hi]
+            costI = costs[d - 1, lo:hi + 1] + icosts[d - hi - 1:d - lo][::-1]
+            costM = costs[d - 2, lo - 1:hi]
+            costS = costM + skew_scosts[d, lo:hi + 1]
+            min_val = numpy.minimum(numpy.minimum(costI, costD), costS)
+            # A match is always the cheapest option, so it is the only op.
+            is_match = skew_match[d, lo:hi + 1]
+            costs[d, lo:hi + 1] = numpy.where(is_match, costM, min_val)
+            # Adds _all_ operations matching minimum value.
+            ops[d, lo:hi + 1] = numpy.where(is_match, OP_M, (costD == min_val) * OP_D |
+                                            (costI == min_val) * OP_I | (costS == min_val) * OP_S)
+            # Checks the transposition candidates.
+            for i in (numpy.flatnonzero(skew_tcand[d, lo:hi + 1]) + lo - 1).tolist():
+                trans = self._transposition(Al, Bl, i, d - i - 2, cost, tcost)
+                if not trans or trans[0] > costs[d, i + 1]:
+                    continue
+                # Replaces all other operations if cheaper.
+                if trans[0] < costs[d, i + 1]:
+                    costs[d, i + 1] = trans[0]
+                    ops[d, i + 1] = 0
+                ops[d, i + 1] |= OP_T
+                tlen[d, i + 1] = trans[1]
+
+        # Returns the table with cell (i, j) at [i, j].
+        I = numpy.arange(n + 1)[:, None]
+        J = numpy.arange(m + 1)[None, :]
+        return costs[I + J, I], ops[I + J, I], tlen[I + J, I]
+
+    def _trace(self, i, j):
+        """
+        Returns the cell (i, j) of the table as a Trace object.
+        """
+        ops = [name if name != "T" else "T" + str(self._tlen[i, j])
+               for (op, name) in OP_ORDER if self._ops[i, j] & op]
+        return Trace(self._costs[i, j].item(), ops or ["O"])
 
     def __repr__(self):
-        return self.pprinter.pformat(self._table)
+        return self.pprinter.pformat(list(self))
 
     def __iter__(self):
-        for row in self._table:
-            yield row
+        for i in range(self.asz + 1):
+            yield self[i]
 
     def __getitem__(self, i):
         """
-        Returns the i-th row of the table, which is a list and so
-        can be indexed. Therefore, e.g.,  self[2][3] == self._table[2][3]
+        Returns the i-th row of the table as a list of Trace objects,
+        which can be indexed. Therefore, e.g., self[2][3].cost is the
+        partial cost of cell (2, 3).
         """
-        return self._table[i]
+        i = range(self.asz + 1)[i]
+        return [self._trace(i, j) for j in range(self.bsz + 1)]
 
     # Stuff for generating alignments.
 
-    def _stepback(self, i, j, trace, path_back):
+    def _stepback(self, i, j, path_back):
         """
-        Given a cell location (i, j) and a Trace object trace, generate
-        all traces they point back to in the table
+        Given a cell location (i, j), generate all cells it points back
+        to in the table
         """
-        for op in trace.ops:
-            if op == "M":
-                yield i - 1, j - 1, self[i - 1][j - 1], path_back + ["M"]
-            elif op == "I":
-                yield i, j - 1, self[i][j - 1], path_back + ["I"]
-            elif op == "D":
-                yield i - 1, j, self[i - 1][j], path_back + ["D"]
-            elif op == "S":
-                yield i - 1, j - 1, self[i - 1][j - 1], path_back + ["S"]
-            elif op.startswith("T"):
-                # Extract stepback (default is a transposition of 2 elements)
-                k = int(op[1:] or 2)
-                yield i - k, j - k, self[i - k][j - k], path_back + [op]
-            elif op == "O":
-                return  # Origin cell, so we're done.
-            else:
-                raise ValueError("Unknown op {!r}".format(op))
+        cell = self._oplist[i][j]
+        if cell & OP_M:
+            yield i - 1, j - 1, path_back + ["M"]
+        if cell & OP_D:
+            yield i - 1, j, path_back + ["D"]
+        if cell & OP_I:
+            yield i, j - 1, path_back + ["I"]
+        if cell & OP_S:
+            yield i - 1, j - 1, path_back + ["S"]
+        if cell & OP_T:
+            # Extract stepback (number of elements in the transposition)
+            k = self._tlen[i, j].item()
+            yield i - k, j - k, path_back + ["T" + str(k)]
 
     def alignments(self, dfirst=False):
         """
@@ -275,9 +511,8 @@ class WagnerFischer(object):
         implicit graph on the dynamic programming table. Use
         breadth-first traversal by default.
         """
-        # Each cell of the queue is a tuple of (i, j, trace, path_back)
-        # where i, j is the current index, trace is the trace object at
-        # this cell
+        # Backpointers are read one cell at a time, so use a list copy.
+        self._oplist = self._ops.tolist()
         if dfirst:
             return self._dfirst_alignments()
         else:
@@ -287,32 +522,77 @@ class WagnerFischer(object):
         """
         Generate alignments via depth-first traversal.
         """
-        stack = list(self._stepback(self.asz, self.bsz, self[-1][-1], []))
+        stack = list(self._stepback(self.asz, self.bsz, []))
         while stack:
-            (i, j, trace, path_back) = stack.pop()
-            if trace.ops == {"O"}:
+            (i, j, path_back) = stack.pop()
+            if self._oplist[i][j] == OP_O:
                 yield path_back[::-1]
                 continue
-            stack.extend(self._stepback(i, j, trace, path_back))
+            stack.extend(self._stepback(i, j, path_back))
 
     def _bfirst_alignments(self):
         """
         Generate alignments via breadth-first traversal.
         """
-        # Each cell of the queue is a tuple of (i, j, trace, path_back)
-        # where i, j is the current index, trace is the trace object at
-        # this cell, and path_back is a reversed list of edit operations
-        # which is initialized as an empty list.
-        queue = collections.deque(self._stepback(self.asz, self.bsz,
-                                                 self[-1][-1], []))
+        # Each cell of the queue is a tuple of (i, j, path_back)
+        # where i, j is the current index and path_back is a reversed
+        # list of edit operations which is initialized as an empty list.
+        queue = collections.deque(self._stepback(self.asz, self.bsz, []))
         while queue:
-            (i, j, trace, path_back) = queue.popleft()
-            if trace.ops == {"O"}:
+            (i, j, path_back) = queue.popleft()
+            if self._oplist[i][j] == OP_O:
                 # We have reached the origin, the end of a reverse path, so
                 # yield the list of edit operations in reverse.
                 yield path_back[::-1]
                 continue
-            queue.extend(self._stepback(i, j, trace, path_back))
+            queue.extend(self._stepback(i, j, path_back))
+
+    def best_alignment(self):
+        """
+        Returns the alignment that depth-first traversal generates first,
+        i.e. next(self.alignments(True)), without generating any others.
+        Every operation in the table steps back to a cell that leads to
+        the origin, so this just follows the operation that depth-first
+        traversal pops first in each cell, the last one in OP_ORDER, in
+        time and memory linear in the length of the alignment. Two empty
+        sequences give an empty alignment.
+
+        >>> wf = WagnerFischer("sitting", "kitten")
+        >>> wf.best_alignment()
+        ['S', 'M', 'M', 'M', 'S', 'M', 'D']
+        >>> wf.best_alignment() == next(wf.alignments(True))
+        True
+        >>> WagnerFischer("a b c".split(), "b c a".split()).best_alignment()
+        ['T3']
+        """
+        ops = self._ops
+        tlen = self._tlen
+        i = self.asz
+        j = self.bsz
+        path_back = []
+        while True:
+            op = ops.item(i, j)
+            if op == OP_O:
+                return path_back[::-1]
+            if op & OP_T:
+                k = tlen.item(i, j)
+                i -= k
+                j -= k
+                path_back.append("T" + str(k))
+            elif op & OP_S:
+                i -= 1
+                j -= 1
+                path_back.append("S")
+            elif op & OP_I:
+                j -= 1
+                path_back.append("I")
+            elif op & OP_D:
+                i -= 1
+                path_back.append("D")
+            else:
+                i -= 1
+                j -= 1
+                path_back.append("M")
 
     def IDS(self):
         """
@@ -331,6 +611,96 @@ class WagnerFischer(object):
                                     opcounts.items()})
 
 
+def char_distance(A, B):
+    """
+    Returns the cost of the optimal alignment of strings A and B with the
+    default costs, and the number of operations in the first alignment
+    generated by depth-first traversal. This is the same as
+
+        wf = WagnerFischer(A, B)
+        wf.cost, len(wf.best_alignment())
+
+    but it does not build a table of Trace objects or an alignment.
+
+    >>> char_distance("sitting", "kitten")
+    (3, 7)
+    >>> char_distance("form", "from")
+    (1, 3)
+    >>> char_distance("colour", "color")
+    (1, 6)
+    """
+    asz = len(A)
+    bsz = len(B)
+    # Keep lowercased versions for transpositions
+    Al = [x.lower() for x in A]
+    Bl = [x.lower() for x in B]
+    costs = [[0] * (bsz + 1) for _ in range(asz + 1)]
+    ops = [[0] * (bsz + 1) for _ in range(asz + 1)]
+    tlen = {}
+    cost = lambda a, b: costs[a][b]
+    # A transposition ending at (i, j) needs A[i] somewhere in B[:j+1] and
+    # B[j] somewhere in A[:i+1]; only these cells need to be checked.
+    first_in_B = [Bl.index(x) if x in Bl else bsz for x in Al]
+    first_in_A = [Al.index(x) if x in Al else asz for x in Bl]
+    ## Fills in edges.
+    ops[0][0] = OP_O  # Start cell.
+    for i in range(1, asz + 1):
+        costs[i][0] = i
+        ops[i][0] = OP_D
+    for j in range(1, bsz + 1):
+        costs[0][j] = j
+        ops[0][j] = OP_I
+
+    ## Fills in rest.
+    for i in range(asz):
+        prev = costs[i]
+        row = costs[i + 1]
+        op_row = ops[i + 1]
+        for j in range(bsz):
+            if A[i] == B[j]:
+                row[j + 1] = prev[j]
+                op_row[j + 1] = OP_M
+                continue
+            costD = prev[j + 1] + 1
+            costI = row[j] + 1
+            costS = prev[j] + 1
+            min_val = min(costI, costD, costS)
+            op = 0
+            # Multiword transpositions, as in WagnerFischer. A transposition
+            # of k + 1 elements costs k.
+            if first_in_B[i] <= j and first_in_A[j] <= i:
+                k = find_transposition(Al, Bl, i, j, cost)
+                if k is not None and costs[i-k][j-k] + k <= min_val:
+                    min_val = costs[i-k][j-k] + k
+                    op = OP_T
+                    tlen[i + 1, j + 1] = k + 1
+            # Adds _all_ operations matching minimum value.
+            op_row[j + 1] = op | (costD == min_val) * OP_D | \
+                (costI == min_val) * OP_I | (costS == min_val) * OP_S
+            row[j + 1] = min_val
+
+    ## Follows the alignment that depth-first traversal finds first; it
+    ## always steps back through the last operation of a cell in OP_ORDER.
+    i = asz
+    j = bsz
+    length = 0
+    while ops[i][j] != OP_O:
+        op = ops[i][j]
+        if op & OP_T:
+            k = tlen[i, j]
+            i -= k
+            j -= k
+        elif op & OP_S or op & OP_M:
+            i -= 1
+            j -= 1
+        elif op & OP_I:
+            j -= 1
+        else:
+            i -= 1
+        length += 1
+    return costs[asz][bsz], length
+
+
 if __name__ == "__main__":
     #doctest.testmod()
     a = raw_input("A: ").split()
@@ -0,0 +1,138 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+import scripts.edit_sets as edit_sets
+
+# The bytes that start every index, and the version of the index format.
+INDEX_MAGIC = b"ERRANTRI"
+INDEX_VERSION = 2
+# After the magic: the version and the position of the json header at the end of the index.
+PREFIX = struct.Struct("<IQ")
+# One record for each edit of the ref, in the order of the m2 file; the parseEdits tuple of the edit:
+# start, end, category id, correction id, number of correction tokens, coder.
+# The ids are the positions of the strings in the category and correction tables of the index.
+EDIT_RECORD = struct.Struct("<iiHIHH")
+
+# Input: A path to a file.
+# Output: The SHA-1 hex digest of the file.
+def fileHash(path):
+	sha1 = hashlib.sha1()
+	with open(path, "rb") as in_file:
+		for block in iter(lambda: in_file.read(1 << 20), b""):
+			sha1.update(block)
+	return sha1.hexdigest()
+
+# Input 1: The path of the index.
+# Input 2: The path of the ref m2 file.
+# Input 3: An iterable of the parsed edits of each sentence; see compare_m2.parseEdits.
+# Output: The number of sentences saved.
+# Save the parsed edits of a ref m2 file in an index, one sentence at a time.
+# The index is: magic, version, header position, the edit records of each sentence,
+# padding, uint32 offsets of the first record of each sentence, the categories and
+# corrections as newline separated utf-8 strings, and a json header.
+# The keys of each evaluation mode are built from the records when the index is read.
+def writeIndex(path, ref_path, sents):
+	# Dictionaries; key is an edit_sets id, value is its id in the index.
+	cats = {}
+	cors = {}
+	offsets = array("I", [0])
+	# Write to a temporary file first, so compare_m2.py never reads a partial index.
+	with open(path+".tmp", "wb") as out:
+		out.write(INDEX_MAGIC+PREFIX.pack(INDEX_VERSION, 0))
+		for edits in sents:
+			records = []
+			for start, end, cat, cor, cor_len, coder in edits:
+				cat = cats.setdefault(cat, len(cats))
+				cor = cors.setdefault(cor, len(cors))
+				records.append(EDIT_RECORD.pack(start, end, cat, cor, cor_len, coder))
+			out.write(b"".join(records))
+			offsets.append(offsets[-1]+len(records))
+		# Align the offsets to 4 bytes.
+		out.write(b"\0"*(-out.tell() % 4))
+		header = {"sha1": fileHash(ref_path),
+			"byteorder": sys.byteorder,
+			"sentences": len(offsets)-1,
+			"offsets": out.tell()}
+		offsets.tofile(out)
+		# The dictionaries are in index id order.
+		for name, strings, ids in [("cats", edit_sets.CATS.strings, cats), ("cors", edit_sets.CORS.strings, cors)]:
+			blob = "\n".join([strings[i] for i in ids]).encode("utf-8")
+			header[name] = [out.tell(), len(blob), len(ids)]
+			out.write(blob)
+		header_pos = out.tell()
+		out.write(json.dumps(header).encode("utf-8"))
+		out.seek(len(INDEX_MAGIC))
+		out.write(PREFIX.pack(INDEX_VERSION, header_pos))
+	os.replace(path+".tmp", path)
+	return len(offsets)-1
+
+# A ref m2 file compiled into edit records by index_m2.py, memory mapped.
+class RefIndex(object):
+
+	def __init__(self, data, offsets, cats, cors):
+		# The memory mapped edit records.
+		self.data = data
+		self.offsets = offsets
+		# The edit_sets ids of the categories and corrections of the index.
+		self.cat_ids = [edit_sets.CATS[cat] for cat in cats]
+		self.cor_ids = [edit_sets.CORS[cor] for cor in cors]
+
+	def __len__(self):
+		return len(self.offsets)-1
+
+	# Output: A generator of the IndexSentences of the ref.
+	def sentences(self):
+		unpack = EDIT_RECORD.iter_unpack
+		size = EDIT_RECORD.size
+		data, offsets, cat_ids, cor_ids = self.data, self.offsets, self.cat_ids, self.cor_ids
+		for sent_id in range(len(self)):
+			records = data[offsets[sent_id]*size:offsets[sent_id+1]*size]
+			yield IndexSentence([(start, end, cat_ids[cat], cor_ids[cor], cor_len, coder)
+				for start, end, cat, cor, cor_len, coder in unpack(records)])
+
+# The parsed edits of one sentence of a RefIndex; used by compare_m2.py in place of an m2 block.
+class IndexSentence(object):
+
+	def __init__(self, edits):
+		# A list of (start, end, cat, cor, cor_len, coder) tuples; see compare_m2.parseEdits.
+		self.edits = edits
+
+	# The edit_sets ids are only meaningful in this process, so sentences
+	# sent to compare_m2.py -workers are pickled with strings instead.
+	def __getstate__(self):
+		return [(start, end, edit_sets.CATS.strings[cat], edit_sets.CORS.strings[cor], cor_len, coder)
+			for start, end, cat, cor, cor_len, coder in self.edits]
+
+	def __setstate__(self, state):
+		self.edits = [(start, end, edit_sets.CATS[cat], edit_sets.CORS[cor], cor_len, coder)
+			for start, end, cat, cor, cor_len, coder in state]
+
+# Input 1: The path of an index.
+# Input 2: The path of the ref m2 file.
+# Output: A RefIndex, or None if the index is missing, from another version of
+# ERRANT, or was not made from the ref m2 file as it is now.
+def loadIndex(path, ref_path):
+	try:
+		with open(path, "rb") as index_file:
+			data = mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ)
+		start = len(INDEX_MAGIC)
+		if data[:start] != INDEX_MAGIC: return None
+		version, header_pos = PREFIX.unpack(data[start:start+PREFIX.size])
+		if version != INDEX_VERSION: return None
+		header = json.loads(data[header_pos:].decode("utf-8"))
+		if header["sha1"] != fileHash(ref_path) or header["byteorder"] != sys.byteorder:
+			return None
+	except (OSError, ValueError, KeyError, struct.error):
+		return None
+	view = memoryview(data)
+	records = view[start+PREFIX.size:header["offsets"]]
+	offsets = view[header["offsets"]:header["offsets"]+4*(header["sentences"]+1)].cast("I")
+	strings = []
+	for name in ["cats", "cors"]:
+		pos, length, count = header[name]
+		strings.append(data[pos:pos+length].decode("utf-8").split("\n") if count else [])
+	return RefIndex(records, offsets, *strings)
@@ -0,0 +1,112 @@
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+import scripts.toolbox as toolbox
+
+# The file that starts every bundle, and the version of the bundle format.
+BUNDLE_MAGIC = b"ERRANTRB"
+BUNDLE_VERSION = 1
+# The bundle and the text resources it is compiled from; relative to the base directory.
+BUNDLE_PATH = "/resources/resources.bin"
+DICT_PATH = "/resources/en_GB-large.txt"
+TAG_MAP_PATH = "/resources/en-ptb_map"
+
+# A sorted table of utf-8 strings in a buffer (e.g. a memory mapped file).
+# Supports fast membership tests without loading the strings into a set.
+class StringTable(object):
+
+	def __init__(self, data, offsets, start):
+		# data[start+offsets[i]:start+offsets[i+1]] is the i-th string.
+		self.data = data
+		self.offsets = offsets
+		self.start = start
+		self.count = len(offsets)-1
+
+	# Input: An index in the table.
+	# Output: The utf-8 encoded string at that index.
+	def item(self, i):
+		return self.data[self.start+self.offsets[i]:self.start+self.offsets[i+1]]
+
+	def __len__(self):
+		return self.count
+
+	# Binary search for the utf-8 encoded string.
+	def __contains__(self, word):
+		key = word.encode("utf-8")
+		lo = 0
+		hi = self.count
+		while lo < hi:
+			mid = (lo+hi)//2
+			if self.item(mid) < key:
+				lo = mid+1
+			else:
+				hi = mid
+		return lo < self.count and self.item(lo) == key
+
+# Input: The base working directory of ERRANT.
+# Output: A dictionary; key is a text resource path, value is [size, modification time].
+# These are saved in the bundle, so a bundle made from other files is not used.
+def sourceStamps(basename):
+	stamps = {}
+	for path in [DICT_PATH, TAG_MAP_PATH]:
+		stat = os.stat(basename+path)
+		stamps[path] = [stat.st_size, stat.st_mtime_ns]
+	return stamps
+
+# Input: The base working directory of ERRANT.
+# Compile the GB English word list and the tag map into a bundle.
+# The bundle is a header followed by a sorted string table of the words:
+# magic, version, header length, json header, padding, uint32 offsets, utf-8 words.
+def buildBundle(basename):
+	words = sorted(set([word.encode("utf-8") for word in toolbox.loadDictionary(basename+DICT_PATH)]))
+	header = {"sources": sourceStamps(basename),
+		"byteorder": sys.byteorder,
+		"tag_map": toolbox.loadTagMap(basename+TAG_MAP_PATH),
+		"words": len(words)}
+	header = json.dumps(header).encode("utf-8")
+	# Align the offsets to 4 bytes.
+	start = len(BUNDLE_MAGIC)+8+len(header)
+	padding = b"\0"*(-start % 4)
+	offsets = array("I", [0])
+	for word in words:
+		offsets.append(offsets[-1]+len(word))
+	# Write to a temporary file first, so a running process never reads a partial bundle.
+	tmp_path = basename+BUNDLE_PATH+".tmp"
+	with open(tmp_path, "wb") as out:
+		out.write(BUNDLE_MAGIC+struct.pack("<II", BUNDLE_VERSION, len(header))+header+padding)
+		offsets.tofile(out)
+		out.write(b"".join(words))
+	os.replace(tmp_path, basename+BUNDLE_PATH)
+
+# Input: The base working directory of ERRANT.
+# Output 1: A StringTable of valid GB English words, or None.
+# Output 2: A dictionary to map PTB tags to Stanford Universal Dependency tags, or None.
+# Memory map the bundle. Returns None, None if it is missing, from an older
+# version of ERRANT, or older than the text resources.
+def loadBundle(basename):
+	try:
+		with open(basename+BUNDLE_PATH, "rb") as bundle_file:
+			data = mmap.mmap(bundle_file.fileno(), 0, access=mmap.ACCESS_READ)
+		magic_len = len(BUNDLE_MAGIC)
+		if data[:magic_len] != BUNDLE_MAGIC: return None, None
+		version, header_len = struct.unpack("<II", data[magic_len:magic_len+8])
+		if version != BUNDLE_VERSION: return None, None
+		start = magic_len+8+header_len
+		header = json.loads(data[magic_len+8:start].decode("utf-8"))
+		if header["sources"] != sourceStamps(basename) or header["byteorder"] != sys.byteorder:
+			return None, None
+	except (OSError, ValueError, KeyError, struct.error):
+		return None, None
+	start += -start % 4
+	blob_start = start+4*(header["words"]+1)
+	offsets = memoryview(data)[start:blob_start].cast("I")
+	return StringTable(data, offsets, blob_start), header["tag_map"]
+
+if __name__ == "__main__":
+	# Get base working directory of ERRANT.
+	basename = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+	buildBundle(basename)
+	print("Saved "+basename+BUNDLE_PATH)
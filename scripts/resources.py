@@ -0,0 +1,24 @@
+import spacy
+from nltk.stem.lancaster import LancasterStemmer
+import scripts.resource_bundle as resource_bundle
+import scripts.toolbox as toolbox
+
+# Input: The base working directory of ERRANT.
+# Output 1: A preloaded spacy processing object.
+# Output 2: The Lancaster stemmer in NLTK.
+# Output 3: A set (or StringTable) of valid GB English words.
+# Output 4: A dictionary to map PTB tags to Stanford Universal Dependency tags.
+def loadResources(basename):
+	# Load Tokenizer and other resources
+	nlp = spacy.load("en")
+	# Lancaster Stemmer
+	stemmer = LancasterStemmer()
+	# Use the precompiled GB English word list and part of speech map if they
+	# are up to date; see resource_bundle.py.
+	gb_spell, tag_map = resource_bundle.loadBundle(basename)
+	if gb_spell is None:
+		# GB English word list (inc -ise and -ize)
+		gb_spell = toolbox.loadDictionary(basename+"/resources/en_GB-large.txt")
+		# Part of speech map file
+		tag_map = toolbox.loadTagMap(basename+"/resources/en-ptb_map")
+	return nlp, stemmer, gb_spell, tag_map
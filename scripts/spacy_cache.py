@@ -0,0 +1,115 @@
+import hashlib
+import os
+import spacy
+from spacy.tokens import Doc
+import scripts.toolbox as toolbox
+
+# The default maximum size of a cache directory in megabytes.
+CACHE_SIZE = 1024
+# The fraction of the maximum size that is left after removing old sentences.
+EVICT_TO = 0.9
+
+# The caches opened in this process; key is the cache directory.
+_caches = {}
+
+# Input 1: The path to a cache directory, or None.
+# Input 2: The maximum size of the cache directory in megabytes.
+# Input 3: A preloaded spacy processing object.
+# Output: The SpacyCache for the directory, or None if there is no directory.
+# Each process opens a directory once.
+def getCache(path, max_mb, nlp):
+	if path is None:
+		return None
+	if path not in _caches:
+		_caches[path] = SpacyCache(path, max_mb, nlp)
+	return _caches[path]
+
+# A directory of spacy annotated sentences that is reused across runs.
+# Each sentence is stored in a file named by a hash of its tokens, the spacy
+# version and the model name and version, so annotations from another model are never reused.
+# Parsed and only POS tagged sentences are stored separately.
+# When the directory grows over its maximum size, the least recently used sentences are removed.
+# Lookups are counted in toolbox.STATS as "annotation_hits" and "annotation_misses".
+class SpacyCache(object):
+
+	def __init__(self, path, max_mb, nlp):
+		self.path = path
+		self.max_size = max_mb*1024*1024
+		self.nlp = nlp
+		meta = getattr(nlp, "meta", {})
+		self.model = " ".join([spacy.__version__, str(meta.get("lang")), str(meta.get("name")), str(meta.get("version"))])
+		os.makedirs(path, exist_ok=True)
+		# The size of the directory; only updated with our own writes until the next eviction.
+		self.size = sum([size for mtime, size, file in self.files()])
+
+	# Input 1: A list of token strings in a sentence.
+	# Input 2: The sentence is parsed, rather than only POS tagged.
+	# Output: The path of the cache file of the sentence.
+	def filePath(self, sent, parsed=True):
+		model = self.model if parsed else self.model+" tagged"
+		key = hashlib.sha1((model+"\n"+" ".join(sent)).encode("utf-8")).hexdigest()
+		return os.path.join(self.path, key[:2], key)
+
+	# Output: A list of (last use time, size, path) tuples; one for each cache file.
+	def files(self):
+		files = []
+		for root, dirs, names in os.walk(self.path):
+			for name in names:
+				try:
+					stat = os.stat(os.path.join(root, name))
+				except OSError: # Removed by another process.
+					continue
+				files.append((stat.st_mtime, stat.st_size, os.path.join(root, name)))
+		return files
+
+	# Input 1: A list of token strings in a sentence.
+	# Input 2: Get the parsed sentence, rather than the only POS tagged sentence.
+	# Output: The cached spacy annotated sentence, or None.
+	def get(self, sent, parsed=True):
+		path = self.filePath(sent, parsed)
+		try:
+			with open(path, "rb") as cache_file:
+				doc = Doc(self.nlp.vocab).from_bytes(cache_file.read())
+			# Loading always sets the dependency attributes, even if they are empty.
+			if not parsed: doc.is_parsed = False
+			# Mark the sentence as recently used.
+			os.utime(path)
+		except (OSError, ValueError):
+			doc = None
+		# Guard against hash collisions and damaged files.
+		if doc is not None and [tok.text for tok in doc] != list(sent):
+			doc = None
+		if doc is None:
+			toolbox.addStat("annotation_misses")
+		else:
+			toolbox.addStat("annotation_hits")
+		return doc
+
+	# Input 1: A list of token strings in a sentence.
+	# Input 2: The spacy annotated sentence.
+	# Input 3: The sentence is parsed, rather than only POS tagged.
+	def put(self, sent, doc, parsed=True):
+		path = self.filePath(sent, parsed)
+		data = doc.to_bytes()
+		os.makedirs(os.path.dirname(path), exist_ok=True)
+		# Write to a temporary file first, so other processes never read a partial file.
+		tmp_path = path+".{}.tmp".format(os.getpid())
+		with open(tmp_path, "wb") as cache_file:
+			cache_file.write(data)
+		os.replace(tmp_path, path)
+		self.size += len(data)
+		if self.size > self.max_size:
+			self.evict()
+
+	# Remove the least recently used sentences until the directory is small enough.
+	def evict(self):
+		files = sorted(self.files())
+		self.size = sum([size for mtime, size, path in files])
+		for mtime, size, path in files:
+			if self.size <= self.max_size*EVICT_TO:
+				break
+			try:
+				os.remove(path)
+			except OSError: # Removed by another process.
+				pass
+			self.size -= size
@@ -1,3 +1,92 @@
+import threading
+from collections import Counter, OrderedDict
+
+# Counts of events in this process, e.g. how often an alignment band was widened.
+# Worker processes send their counts back with their results; see workers.py.
+# Counts are added with addStat, so they are not lost when several threads add to them at once.
+STATS = Counter()
+STATS_LOCK = threading.Lock()
+# Every LRUCache made in this process; see clearCaches.
+CACHES = []
+
+# Input 1: A STATS key.
+# Input 2: The amount to add to it. (default: 1)
+def addStat(key, amount=1):
+	with STATS_LOCK:
+		STATS[key] += amount
+
+# A dictionary that holds at most `size` items and forgets the least recently used.
+# Lookups are counted in STATS as "<name>_hits" and "<name>_misses". Only this cache
+# changes those keys, and only while it holds its own lock, so they do not need addStat.
+# It can be used from many threads at once.
+class LRUCache(object):
+
+	def __init__(self, name, size):
+		self.name = name
+		self.size = size
+		self.items = OrderedDict()
+		self.lock = threading.Lock()
+		CACHES.append(self)
+
+	def __len__(self):
+		return len(self.items)
+
+	# Input: A hashable key.
+	# Output: The cached value, or None if the key is not cached.
+	def get(self, key):
+		with self.lock:
+			value = self.items.get(key)
+			if value is None:
+				STATS[self.name+"_misses"] += 1
+			else:
+				STATS[self.name+"_hits"] += 1
+				self.items.move_to_end(key)
+			return value
+
+	# Input 1: A hashable key.
+	# Input 2: The value to cache; not None.
+	# The number of cached items is kept in STATS as "<name>_size".
+	def put(self, key, value):
+		with self.lock:
+			if key not in self.items:
+				STATS[self.name+"_size"] += 1
+			self.items[key] = value
+			self.items.move_to_end(key)
+			if len(self.items) > self.size:
+				self.items.popitem(last=False)
+				STATS[self.name+"_size"] -= 1
+
+	# Forget all the cached items.
+	def clear(self):
+		with self.lock:
+			if self.items:
+				STATS[self.name+"_size"] -= len(self.items)
+				self.items.clear()
+
+# Forget the items of every LRUCache, e.g. to time code without the results of earlier runs.
+def clearCaches():
+	for cache in CACHES:
+		cache.clear()
+
+# Input: The name of an LRUCache.
+# Output: A summary of the hits and misses of the cache, or None if it was not used.
+# With worker processes, the size is the total over the caches of all workers.
+def cacheSummary(name):
+	hits = STATS[name+"_hits"]
+	misses = STATS[name+"_misses"]
+	if not hits+misses: return None
+	summary = "{} cache: ".format(name)
+	if name+"_size" in STATS:
+		summary += "{} entries, ".format(STATS[name+"_size"])
+	return summary+"{} hits, {} misses ({:.2f}% hits)".format(hits, misses, 100*hits/(hits+misses))
+
+# Output: A summary of how many only POS tagged sentences were parsed later, or None if there were none.
+def parseSummary():
+	tagged = STATS["tagged_only"]
+	if not tagged: return None
+	parsed = STATS["lazy_parses"]
+	return "Lazy parsing: {} of {} sentences parsed ({:.2f}% skipped)".format(parsed, tagged, 100*(tagged-parsed)/tagged)
+
 # Load latest Hunspell dictionaries: 
 def loadDictionary(path):
 	return set(open(path).read().split())
@@ -25,13 +114,56 @@ def loadTagMap(path):
 	map_dict["XX"] = "X"
 	return map_dict	
 	
-# Input: A sentence + edit block in an m2 file.
+# Input: A path to an m2 file.
+# Output: A generator of M2Block objects; one for each sentence + edit block.
+# Only one block is held in memory at a time.
+def readM2(path):
+	with open(path) as m2_file:
+		lines = []
+		for line in m2_file:
+			line = line.rstrip("\r\n")
+			# Blank lines separate the blocks.
+			if line.strip():
+				lines.append(line)
+			elif lines:
+				yield M2Block(lines)
+				lines = []
+		if lines:
+			yield M2Block(lines)
+
+# A sentence + edit block in an m2 file.
+# The block is only processed into sentences and edits when they are accessed.
+class M2Block(object):
+
+	def __init__(self, lines):
+		# The lines of the block; the S line followed by the A lines.
+		self.lines = lines
+		self._processed = None
+
+	# The block as it appears in the m2 file.
+	@property
+	def text(self):
+		return "\n".join(self.lines)
+
+	# The original sentence (a list of tokens)
+	@property
+	def orig_sent(self):
+		return self.lines[0][2:].split() # [2:] ignore the leading "S "
+
+	# A dictionary; key is coder id, value is a (cor_sent, edits) tuple. See processM2.
+	@property
+	def coder_dict(self):
+		if self._processed is None:
+			self._processed = processM2(self.lines)
+		return self._processed[1]
+
+# Input: A sentence + edit block in an m2 file; a string or a list of lines.
 # Output 1: The original sentence (a list of tokens)
 # Output 2: A dictionary; key is coder id, value is a tuple. 
 # tuple[0] is the corrected sentence (a list of tokens), tuple[1] is the edits.
 # Process M2 to extract sentences and edits.
 def processM2(info):
-	info = info.split("\n")
+	if isinstance(info, str): info = info.split("\n")
 	orig_sent = info[0][2:].split() # [2:] ignore the leading "S "
 	all_edits = info[1:]
 	# Simplify the edits and group by coder id.
@@ -95,6 +227,40 @@ def applySpacy(sent, nlp):
 	nlp.parser(sent)
 	return sent
 
+# Input 1: A list of sentences; each a list of token strings.
+# Input 2: A preloaded Spacy processing object.
+# Input 3: The number of sentences spacy processes at a time.
+# Input 4: A SpacyCache of previously annotated sentences. (optional)
+# Input 5: Also parse the sentences. If False, they are only POS tagged; see parseIfNeeded.
+# Output: A list of annotated spacy sentences in the same order.
+# Annotate many sentences at once; equivalent to applySpacy on each sentence.
+def applySpacyBatch(sents, nlp, batch_size, cache=None, parse=True):
+	# Only annotate the sentences that are not in the cache, and add them to it.
+	if cache:
+		docs = [cache.get(sent, parse) for sent in sents]
+		missing = [i for i, doc in enumerate(docs) if doc is None]
+		if not parse: addStat("tagged_only", len(sents)-len(missing))
+		for i, doc in zip(missing, applySpacyBatch([sents[i] for i in missing], nlp, batch_size, parse=parse)):
+			cache.put(sents[i], doc, parse)
+			docs[i] = doc
+		return docs
+	# Convert tokens to spacy tokens, then POS tag and parse them in batches.
+	sents = [nlp.tokenizer.tokens_from_list(sent) for sent in sents]
+	sents = nlp.tagger.pipe(sents, batch_size=batch_size)
+	if not parse:
+		sents = list(sents)
+		addStat("tagged_only", len(sents))
+		return sents
+	return list(nlp.parser.pipe(sents, batch_size=batch_size))
+
+# Input 1: A spacy sentence from applySpacyBatch; parsed or only POS tagged.
+# Input 2: A preloaded Spacy processing object.
+# Parse the sentence if it was only POS tagged. Each sentence is parsed at most once.
+def parseIfNeeded(sent, nlp):
+	if not sent.is_parsed:
+		nlp.parser(sent)
+		addStat("lazy_parses")
+
 # Input 1: An edit list. [orig_start, orig_end, cat, cor, cor_start, cor_end]
 # Input 2: An original SpaCy sentence.
 # Input 3: A corrected SpaCy sentence.
@@ -0,0 +1,56 @@
+import spacy.parts_of_speech as spos
+import scripts.toolbox as toolbox
+
+# The maximum number of word types whose features are remembered.
+WORD_CACHE_SIZE = 100000
+# WordType objects of the words seen so far.
+WORD_CACHE = toolbox.LRUCache("word", WORD_CACHE_SIZE)
+
+# Input: A word string.
+# Output: The cached WordType of the word.
+def getWordType(word):
+	word_type = WORD_CACHE.get(word)
+	if word_type is None:
+		word_type = WordType(word)
+		WORD_CACHE.put(word, word_type)
+	return word_type
+
+# Features of a word type that alignment and classification need over and over.
+# Each feature is only computed the first time it is needed. Features are saved
+# with the resource they were computed with, and recomputed for another resource.
+# Lemmas depend on case, so pass the lower cased word if that is what you want.
+class WordType(object):
+
+	__slots__ = ("word", "isalpha", "_lemmas", "_stem", "_in_dict")
+
+	def __init__(self, word):
+		self.word = word
+		self.isalpha = word.isalpha()
+		# (resource, feature) tuples.
+		self._lemmas = (None, None)
+		self._stem = (None, None)
+		self._in_dict = (None, None)
+
+	# Input: A preloaded spacy processing object.
+	# Output: The set of lemmas (string ids) of the word as an ADJ, ADV, NOUN or VERB.
+	def lemmas(self, nlp):
+		if self._lemmas[0] is not nlp:
+			morph = nlp.vocab.morphology
+			orth = nlp.vocab.strings[self.word]
+			self._lemmas = (nlp, frozenset([morph.lemmatize(pos, orth, morph.tag_map)
+				for pos in (spos.ADJ, spos.ADV, spos.NOUN, spos.VERB)]))
+		return self._lemmas[1]
+
+	# Input: The Lancaster stemmer in NLTK.
+	# Output: The stem of the word.
+	def stem(self, stemmer):
+		if self._stem[0] is not stemmer:
+			self._stem = (stemmer, stemmer.stem(self.word))
+		return self._stem[1]
+
+	# Input: A set of valid GB English words.
+	# Output: Boolean; the word or its lower case form is in the set.
+	def inDict(self, gb_spell):
+		if self._in_dict[0] is not gb_spell:
+			self._in_dict = (gb_spell, self.word in gb_spell or self.word.lower() in gb_spell)
+		return self._in_dict[1]
@@ -0,0 +1,89 @@
+import multiprocessing
+import time
+from collections import deque
+import scripts.profiler as profiler
+import scripts.toolbox as toolbox
+
+# The maximum estimated cost of a chunk of sentences sent to a worker.
+CHUNK_BUDGET = 50000
+# The number of chunks each worker may have queued ahead of the output.
+CHUNKS_AHEAD = 4
+
+# Resources and task info loaded once in each worker process.
+_worker = {}
+
+# Input 1: An iterable of sentence blocks.
+# Input 2: The maximum number of blocks in a chunk.
+# Input 3: A function that estimates the processing cost of a block. (optional)
+# Input 4: The maximum total cost of the blocks in a chunk. (optional)
+# Output: A generator of lists of consecutive blocks.
+# Long sentences cost more to align, so chunks of long sentences contain fewer
+# blocks. This keeps chunks roughly equal in work and avoids stragglers.
+def chunkBlocks(blocks, size, cost=None, budget=CHUNK_BUDGET):
+	chunk = []
+	total = 0
+	for block in blocks:
+		chunk.append(block)
+		if cost: total += cost(block)
+		if len(chunk) >= size or total >= budget:
+			yield chunk
+			chunk = []
+			total = 0
+	if chunk:
+		yield chunk
+
+# Input 1: The base working directory of ERRANT, or None if no resources are needed.
+# Input 2: A function that processes a chunk of blocks.
+# Input 3: Command line args.
+# Input 4: The slow log size if the main process is profiling, otherwise None.
+# Load the resources once when a worker process starts.
+def initWorker(basename, func, args, profile):
+	_worker["func"] = func
+	_worker["args"] = args
+	_worker["resources"] = ()
+	if profile is not None: profiler.enable(profile)
+	if basename is not None:
+		start = time.perf_counter()
+		# Only import spacy in workers that need it; compare_m2.py does not.
+		import scripts.resources as resources
+		_worker["resources"] = resources.loadResources(basename)
+		if profiler.ENABLED: profiler.addTime("load", start)
+
+# Input: A chunk of sentence blocks.
+# Output 1: The result of processing the chunk in this worker.
+# Output 2: The toolbox.STATS counts collected while processing the chunk.
+# Output 3: The profiler slow log of the chunk.
+def runChunk(chunk):
+	result = _worker["func"](chunk, _worker["args"], *_worker["resources"])
+	stats = toolbox.STATS.copy()
+	toolbox.STATS.clear()
+	return result, stats, profiler.takeSlow()
+
+# Input 1: A function that processes a chunk of blocks.
+# Input 2: An iterable of chunks.
+# Input 3: Command line args.
+# Input 4: The base working directory of ERRANT, or None if func does not need the resources.
+# Input 5: The number of worker processes.
+# Output: A generator of processed chunks in input order.
+# Chunks are handed out to whichever worker is free, but at most a few chunks
+# per worker are in flight, so memory stays bounded on large inputs.
+# The toolbox.STATS counts and profiler slow logs of the workers are added to those of this process.
+def imapChunks(func, chunks, args, basename, workers):
+	profile = profiler.SLOW_SIZE if profiler.ENABLED else None
+	with multiprocessing.Pool(workers, initWorker, (basename, func, args, profile)) as pool:
+		pending = deque()
+		for chunk in chunks:
+			pending.append(pool.apply_async(runChunk, (chunk,)))
+			if len(pending) >= workers*CHUNKS_AHEAD:
+				yield collectChunk(pending.popleft())
+		while pending:
+			yield collectChunk(pending.popleft())
+
+# Input: The pending result of runChunk.
+# Output: The processed chunk. The worker's counts are added to toolbox.STATS.
+def collectChunk(pending):
+	result, stats, slow = pending.get()
+	toolbox.STATS.update(stats)
+	for entry in slow:
+		profiler.addSlow(*entry)
+	return result